@@ -1,34 +1,63 @@
 import asyncio
-import json
+import random
+from typing import Iterable, Optional
+
+import httpx
+import orjson
 import websockets
 from websockets.exceptions import ConnectionClosed
 import config
 from logging_config import api_logger, logger
 
+# Reconnect backoff bounds for the WebSocket client, in seconds
+WS_RECONNECT_MIN_DELAY = 1.0
+WS_RECONNECT_MAX_DELAY = 60.0
+
+# Upper bound on the number of ticker channels the client will track
+MAX_WS_SUBSCRIPTIONS = 200
+
 
 class BitunixWSClient:
     def __init__(self, url):
         self.url = url
         self.subscriptions = set()
+        # Pairs added while connected, waiting to be sent in one batch
+        self._pending_subscriptions = set()
+        self._flush_task = None
         self.websocket = None
         self.is_running = False
+        self._run_task = None
 
     async def _send_json(self, message):
         if self.websocket:
-            await self.websocket.send(json.dumps(message))
+            # Decode so the frame is still sent as text rather than binary
+            await self.websocket.send(orjson.dumps(message).decode())
 
-    async def _subscribe(self, pair: str):
-        """Subscribes to a specific pair's ticker channel."""
-        self.subscriptions.add(pair)
-        if self.websocket:
-            sub_message = {"op": "subscribe", "args": [f"tickers.{pair}"]}
+    async def _subscribe(self, pairs):
+        """Subscribes to the ticker channels of several pairs in one message."""
+        if self.websocket and pairs:
+            sub_message = {"op": "subscribe", "args": [f"tickers.{p}" for p in pairs]}
             await self._send_json(sub_message)
-            api_logger.info(f"Sent subscription request for {pair}")
+            api_logger.info(f"Sent subscription request for {', '.join(pairs)}")
+
+    async def _flush_pending(self):
+        """Sends every subscription queued since the last flush as one batch."""
+        pairs = sorted(self._pending_subscriptions)
+        self._pending_subscriptions.clear()
+        self._flush_task = None
+        await self._subscribe(pairs)
+
+    async def _unsubscribe(self, pair: str):
+        """Unsubscribes from a specific pair's ticker channel."""
+        if self.websocket:
+            unsub_message = {"op": "unsubscribe", "args": [f"tickers.{pair}"]}
+            await self._send_json(unsub_message)
+            api_logger.info(f"Sent unsubscribe request for {pair}")
 
     async def _process_message(self, message):
         """Processes incoming messages from the WebSocket."""
         try:
-            data = json.loads(message)
+            data = orjson.loads(message)
 
             # Handle ping/pong to keep connection alive
             if "ping" in data:
@@ -47,8 +76,13 @@ class BitunixWSClient:
                     price = ticker_data.get("lastPrice")
                     if pair and price:
                         config.LATEST_PRICES[pair] = float(price)
+                        # Wake up every monitor waiting on this pair
+                        price_event = config.PRICE_EVENTS.get(pair)
+                        if price_event:
+                            price_event.set()
+                            price_event.clear()
 
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             api_logger.warning(f"Could not decode JSON: {message}")
         except Exception as e:
             logger.exception(f"Error processing WebSocket message: {e}")
@@ -56,15 +90,17 @@ class BitunixWSClient:
     async def run(self):
         """The main loop to connect, reconnect, and process messages."""
         self.is_running = True
+        backoff = WS_RECONNECT_MIN_DELAY
         while self.is_running:
             try:
-                async with websockets.connect(self.url) as ws:
+                async with websockets.connect(self.url, proxy=config.PROXY_URL) as ws:
                     self.websocket = ws
+                    backoff = WS_RECONNECT_MIN_DELAY
                     api_logger.info("Successfully connected to Bitunix WebSocket API.")
 
                     # Re-subscribe to all tracked pairs on connection
-                    for pair in list(self.subscriptions):
-                        await self._subscribe(pair)
+                    self._pending_subscriptions.clear()
+                    await self._subscribe(sorted(self.subscriptions))
 
                     async for message in self.websocket:
                         await self._process_message(message)
@@ -74,27 +110,107 @@ class BitunixWSClient:
                 ConnectionRefusedError,
                 asyncio.TimeoutError,
             ) as e:
-                api_logger.error(
-                    f"WebSocket connection lost: {e}. Reconnecting in 10 seconds..."
-                )
+                api_logger.error(f"WebSocket connection lost: {e}.")
             except Exception as e:
                 logger.exception(
                     "An unexpected error occurred in the WebSocket client."
                 )
             finally:
                 self.websocket = None
-                await asyncio.sleep(10)
-
-    def add_subscription(self, pair: str):
-        """Public method to add a new subscription."""
-        if pair not in self.subscriptions:
-            api_logger.info(f"Queueing subscription for {pair}")
-            # The `run` loop will pick up the new subscription
-            # on the next connection or we can send it live
+
+            # Cancellation skips this entirely, so stop() never waits on a backoff
+            if not self.is_running:
+                break
+            # Exponential backoff with jitter so an outage doesn't cause
+            # a reconnect storm
+            delay = backoff + random.uniform(0, WS_RECONNECT_MIN_DELAY)
+            api_logger.info(f"Reconnecting in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, WS_RECONNECT_MAX_DELAY)
+
+    def start(self):
+        """Runs the client as a background task on the current event loop."""
+        if self._run_task is None:
+            self._run_task = asyncio.create_task(self.run(), name="bitunix-ws")
+
+    async def stop(self):
+        """Stops the reconnect loop and cancels the background task."""
+        self.is_running = False
+        if self._run_task is not None:
+            self._run_task.cancel()
+            try:
+                await self._run_task
+            except asyncio.CancelledError:
+                pass
+            self._run_task = None
+
+    def can_subscribe(self, pair: str) -> bool:
+        """Whether `pair` is already tracked or fits under the subscription limit."""
+        return (
+            pair in self.subscriptions or len(self.subscriptions) < MAX_WS_SUBSCRIPTIONS
+        )
+
+    def add_subscription(self, pair: str) -> bool:
+        """Public method to add a new subscription; False if the limit was hit."""
+        if pair in self.subscriptions:
+            return True
+        if not self.can_subscribe(pair):
+            api_logger.error(
+                f"Subscription limit ({MAX_WS_SUBSCRIPTIONS}) reached, ignoring {pair}"
+            )
+            return False
+
+        api_logger.info(f"Queueing subscription for {pair}")
+        # Tracked immediately so a reconnect always re-subscribes it. While
+        # connected, pairs added in the same loop iteration share one message.
+        self.subscriptions.add(pair)
+        if self.websocket:
+            self._pending_subscriptions.add(pair)
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_pending())
+        return True
+
+    def add_subscriptions(self, pairs: Iterable[str]):
+        """Queues several subscriptions; while connected they go out as one message."""
+        for pair in pairs:
+            self.add_subscription(pair)
+
+    def remove_subscription(self, pair: str):
+        """Public method to drop a subscription that is no longer needed."""
+        if pair in self.subscriptions:
+            self.subscriptions.discard(pair)
+            self._pending_subscriptions.discard(pair)
+            config.LATEST_PRICES.pop(pair, None)
+            api_logger.info(f"Removing subscription for {pair}")
             if self.websocket:
-                asyncio.create_task(self._subscribe(pair))
-            else:
-                self.subscriptions.add(pair)
+                asyncio.create_task(self._unsubscribe(pair))
 
 
 ws_client = BitunixWSClient(config.BITUNIX_WS_URL)
+
+
+# --- Shared REST client ---
+# A single async HTTP client so REST calls reuse pooled connections
+# and never block the event loop
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared async HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(max_connections=50, keepalive_expiry=60),
+            proxy=config.PROXY_URL,
+            trust_env=False,
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Closes the shared async HTTP client, if it was ever opened."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -1,55 +1,113 @@
-import requests
-import pandas as pd
+import asyncio
+
 import numpy as np
-from typing import List, Optional
+import orjson
+from typing import FrozenSet, List, Optional, Sequence
 
 import config
-from bot.decorators import retry_on_network_error
+from api_manager import get_http_client
+from bot.decorators import async_ttl_cache, retry_on_network_error
 from logging_config import api_logger, logger
 
+KLINE_URL = f"{config.BITUNIX_API_URL}/futures/market/kline"
+TICKERS_URL = f"{config.BITUNIX_API_URL}/futures/market/tickers"
+
+# How long fetched klines / tickers are reused, in seconds. Kept well below
+# the RSI check interval so every tick still sees fresh candles.
+KLINE_CACHE_TTL = 5
+TICKERS_CACHE_TTL = 2
+
+# Caps concurrent kline requests; RSI jobs are aligned to the same tick
+# boundary, so their fetches all fire at once
+MAX_CONCURRENT_KLINE_REQUESTS = 20
+_kline_semaphore = asyncio.Semaphore(MAX_CONCURRENT_KLINE_REQUESTS)
 
+
+@async_ttl_cache(ttl=KLINE_CACHE_TTL)
 @retry_on_network_error()
-def get_kline_data(
+async def get_kline_data(
     pair: str, timeframe: str, limit: int = 200
-) -> Optional[List[float]]:
+) -> Optional[np.ndarray]:
     """
     Fetches historical k-line (candlestick) data from the BitUnix REST API.
-    Returns a list of closing prices.
+    Returns the closing prices as a float64 array, or None if there are none.
     """
-    url = f"{config.BITUNIX_API_URL}/futures/market/kline"
     params = {"symbol": pair, "interval": timeframe, "limit": limit}
-    api_logger.info(f"REQUEST -> get_kline_data: URL={url}, Params={params}")
+    api_logger.info("REQUEST -> get_kline_data: URL=%s, Params=%s", KLINE_URL, params)
 
-    response = requests.get(url, params=params, timeout=10)
-    api_logger.info(f"RESPONSE -> get_kline_data: Status={response.status_code}")
+    async with _kline_semaphore:
+        response = await get_http_client().get(KLINE_URL, params=params)
+    api_logger.info("RESPONSE -> get_kline_data: Status=%s", response.status_code)
     response.raise_for_status()
 
-    data = response.json().get("data", [])
+    # orjson parses the up-to-200-candle payload much faster than stdlib json
+    data = orjson.loads(response.content).get("data", [])
+    if not data:
+        return None
     # The closing price is the 5th element (index 4) in each sub-array.
     # Added a check to ensure the candle list is well-formed before accessing index 4.
-    closing_prices = [
-        float(candle[4])
-        for candle in data
-        if isinstance(candle, list) and len(candle) > 4
-    ]
-    return closing_prices
+    closing_prices = np.fromiter(
+        (candle[4] for candle in data if isinstance(candle, list) and len(candle) > 4),
+        dtype=np.float64,
+        count=-1,
+    )
+    return closing_prices if closing_prices.size else None
+
+
+@async_ttl_cache(ttl=TICKERS_CACHE_TTL)
+async def get_tickers(symbols: str) -> List[dict]:
+    """
+    Fetches ticker data from the BitUnix REST API for a comma-separated
+    list of symbols.
+    """
+    params = {"symbols": symbols}
+    api_logger.info("REQUEST -> get_tickers: URL=%s, Params=%s", TICKERS_URL, params)
+
+    response = await get_http_client().get(TICKERS_URL, params=params)
+    api_logger.info("RESPONSE -> get_tickers: Status=%s", response.status_code)
+    response.raise_for_status()
+
+    return orjson.loads(response.content).get("data", [])
+
+
+@retry_on_network_error()
+async def get_all_symbols() -> Optional[FrozenSet[str]]:
+    """Fetches the set of every symbol listed on the BitUnix futures market."""
+    api_logger.info("REQUEST -> get_all_symbols: URL=%s", TICKERS_URL)
+
+    response = await get_http_client().get(TICKERS_URL)
+    api_logger.info("RESPONSE -> get_all_symbols: Status=%s", response.status_code)
+    response.raise_for_status()
+
+    data = orjson.loads(response.content).get("data", [])
+    return frozenset(t["symbol"] for t in data if t.get("symbol")) or None
 
 
-def calculate_rsi(prices: List[float], period: int = 14) -> Optional[float]:
+def calculate_rsi(prices: Sequence[float], period: int = 14) -> Optional[float]:
     """
-    Calculates the Relative Strength Index (RSI) for a given list of prices.
+    Calculates the Relative Strength Index (RSI) for a given list of prices,
+    using Wilder's smoothing of average gains and losses.
     """
-    if len(prices) < period:
+    # `period` price changes are needed to seed the averages
+    if len(prices) <= period:
         return None
 
-    series = pd.Series(prices)
-    delta = series.diff()
+    delta = np.diff(np.asarray(prices, dtype=np.float64))
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
 
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    # Wilder's smoothing avg = avg * (1 - a) + x * a with a = 1/period,
+    # unrolled into one weighted sum over the changes after the seed window
+    alpha = 1.0 / period
+    steps = len(delta) - period
+    weights = alpha * (1.0 - alpha) ** np.arange(steps - 1, -1, -1)
+    seed_decay = (1.0 - alpha) ** steps
+    avg_gain = gains[:period].mean() * seed_decay + weights @ gains[period:]
+    avg_loss = losses[:period].mean() * seed_decay + weights @ losses[period:]
 
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
+    if avg_loss == 0:
+        # No losses: RSI is 100, or undefined if the price never moved
+        return 100.0 if avg_gain > 0 else None
 
-    # Return the most recent RSI value
-    return rsi.iloc[-1]
+    rs = avg_gain / avg_loss
+    return float(100 - (100 / (1 + rs)))
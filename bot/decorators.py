@@ -1,36 +1,65 @@
 import asyncio
+import random
 import time
+from collections import OrderedDict
 from functools import wraps
+
+import httpx
 from requests.exceptions import RequestException
 from telegram.error import NetworkError
 from logging_config import logger
 
 
-def retry_on_network_error(max_retries=3, initial_delay=2):
+# Errors retried by default: transport failures and HTTP errors from any client
+NETWORK_ERRORS = (RequestException, httpx.HTTPError, NetworkError)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Client (4xx) HTTP errors won't succeed on retry, except rate limiting."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is None or status >= 500 or status == 429
+
+
+def retry_on_network_error(
+    max_retries=3, initial_delay=2, max_delay=30, retry_on=NETWORK_ERRORS
+):
     """
-    A decorator to retry a function if a RequestException or
-    Telegram NetworkError occurs, using exponential backoff.
+    A decorator to retry a function if one of `retry_on` occurs, using capped
+    exponential backoff with jitter. Returns None once retries are exhausted
+    or on a client error that retrying can't fix.
     """
 
     def decorator(func):
+        def next_delay(error, attempt, delay):
+            """Returns how long to sleep before the next attempt, or None to give up."""
+            if not _is_retryable(error):
+                logger.error(f"Non-retryable error in '{func.__name__}': {error}")
+                return None
+            if attempt == max_retries - 1:
+                logger.error(
+                    f"Function '{func.__name__}' failed after {max_retries} attempts."
+                )
+                return None
+            # Jitter keeps concurrent callers from retrying in lockstep
+            sleep_for = random.uniform(delay / 2, delay)
+            logger.warning(
+                f"Network error in '{func.__name__}' (Attempt {attempt + 1}/{max_retries}): {error}. "
+                f"Retrying in {sleep_for:.1f} seconds..."
+            )
+            return sleep_for
+
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
             delay = initial_delay
             for attempt in range(max_retries):
                 try:
                     return await func(*args, **kwargs)
-                except (RequestException, NetworkError) as e:
-                    logger.warning(
-                        f"Network error in '{func.__name__}' (Attempt {attempt + 1}/{max_retries}): {e}. "
-                        f"Retrying in {delay} seconds..."
-                    )
-                    if attempt == max_retries - 1:
-                        logger.error(
-                            f"Function '{func.__name__}' failed after {max_retries} attempts."
-                        )
+                except retry_on as e:
+                    sleep_for = next_delay(e, attempt, delay)
+                    if sleep_for is None:
                         return None
-                    await asyncio.sleep(delay)
-                    delay *= 2
+                    await asyncio.sleep(sleep_for)
+                    delay = min(delay * 2, max_delay)
             return None
 
         @wraps(func)
@@ -39,18 +68,12 @@ def retry_on_network_error(max_retries=3, initial_delay=2):
             for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
-                except RequestException as e:
-                    logger.warning(
-                        f"Network error in '{func.__name__}' (Attempt {attempt + 1}/{max_retries}): {e}. "
-                        f"Retrying in {delay} seconds..."
-                    )
-                    if attempt == max_retries - 1:
-                        logger.error(
-                            f"Function '{func.__name__}' failed after {max_retries} attempts."
-                        )
+                except retry_on as e:
+                    sleep_for = next_delay(e, attempt, delay)
+                    if sleep_for is None:
                         return None
-                    time.sleep(delay)
-                    delay *= 2
+                    time.sleep(sleep_for)
+                    delay = min(delay * 2, max_delay)
             return None
 
         if asyncio.iscoroutinefunction(func):
@@ -59,3 +82,47 @@ def retry_on_network_error(max_retries=3, initial_delay=2):
             return sync_wrapper
 
     return decorator
+
+
+def async_ttl_cache(ttl: float, maxsize: int = 256):
+    """
+    A decorator that caches an async function's results per argument tuple
+    for `ttl` seconds. Concurrent calls with the same arguments share a single
+    in-flight call instead of each hitting the network. None is not cached.
+    """
+
+    def decorator(func):
+        cache = OrderedDict()  # key -> (expires_at, value)
+        in_flight = {}  # key -> asyncio.Task
+
+        def _store(key, task):
+            in_flight.pop(key, None)
+            if task.cancelled() or task.exception() is not None:
+                return
+            value = task.result()
+            if value is None:
+                return
+            cache[key] = (time.monotonic() + ttl, value)
+            cache.move_to_end(key)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            hit = cache.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                return hit[1]
+
+            task = in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                in_flight[key] = task
+                task.add_done_callback(lambda t: _store(key, t))
+            # Shielded so one cancelled caller doesn't cancel the shared call
+            return await asyncio.shield(task)
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
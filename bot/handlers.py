@@ -1,20 +1,109 @@
 import asyncio
+from functools import lru_cache
 from textwrap import dedent
+from typing import List, Tuple
 
+import httpx
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.error import BadRequest, NetworkError
+from telegram.error import BadRequest, NetworkError, TimedOut
 from telegram.ext import ContextTypes, ConversationHandler
 
 import config
+from api_manager import ws_client
+from bot.data_fetcher import get_tickers
 from bot.monitors import stop_alarm_task, start_alarm_task
 from bot.ui import AlertManager
 from bot.utils import translate_alert_type, is_valid_pair, parse_duration
-from .constants import *
-from database_manager import DatabaseManager
+from .constants import (
+    MAIN_MENU,
+    VIEW_ALERT,
+    VIEW_ALERT_DETAILS,
+    ALERT_TYPE,
+    PAIR_INPUT,
+    PRICE_INPUT,
+    DESCRIPTION_INPUT,
+    TIMEFRAME_INPUT,
+    RSI_PERIOD_INPUT,
+    RSI_CONDITION_INPUT,
+    RSI_THRESHOLD_INPUT,
+)
+from database_manager import AlertSummary, db
 from logging_config import msg_logger, api_logger, logger
 
 
-db = DatabaseManager(config.DB_FILE)
+# Delays (in seconds) between retries when sending a message times out
+SEND_RETRY_DELAYS = (0.5, 1, 2)
+
+# Longest /summary waits on the REST API for symbols the WebSocket feed
+# hasn't delivered yet, in seconds
+SUMMARY_FETCH_TIMEOUT = 3
+
+# (symbol, display name) pairs for /summary, e.g. BTCUSDT -> BTC-USDT
+SUMMARY_DISPLAY = tuple(
+    (symbol, symbol.replace("USDT", "-USDT")) for symbol in config.SUMMARY_SYMBOLS
+)
+
+VALID_TIMEFRAMES = ("1m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "12h", "1d")
+
+# --- Static Texts ---
+WELCOME_TEMPLATE = dedent(
+    """
+    🔔 خوش آمدید به Crypto Alarm Bot! 🎉
+    👋 سلام {first_name}!
+
+    برای شروع از دکمه‌ها استفاده کنید یا از دستورات سریع زیر کمک بگیرید:
+    /new_alarm - ساخت آلارم جدید
+    /list_alarms - مشاهده آلارم‌ها
+    /summary - قیمت لحظه‌ای ارزها
+    /help - راهنما
+    """
+)
+
+HELP_TEXT = dedent(
+    """
+    🆘 راهنمای ربات Crypto Alarm Bot
+
+    در اینجا لیستی از تمام دستورات و ویژگی‌های موجود آمده است:
+
+    دستورات اصلی:
+    /start - نمایش منوی اصلی و شروع کار با ربات
+    /help - نمایش همین پیام راهنما
+
+    دستورات سریع:
+    /new_alarm - شروع فرآیند ایجاد یک آلارم جدید
+    /list_alarms - نمایش تمام آلارم‌های فعال شما
+    /summary - نمایش قیمت لحظه‌ای ارزهای منتخب
+    /remind <زمان> <پیام> - تنظیم یک یادآوری ساده (مثال: /remind 1h30m پیام تست)
+
+    در طول فرآیندها:
+    /cancel - لغو عملیات فعلی (مانند ساخت آلارم)
+    """
+)
+
+
+# --- Static Keyboards ---
+# Markups are immutable, so the ones that never change are built only once
+BACK_TO_MAIN_BUTTON = InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")
+MAIN_MENU_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("🔔 ایجاد آلارم جدید", callback_data="new_alert")],
+        [InlineKeyboardButton("📋 مشاهده آلارم‌ها", callback_data="view_alerts")],
+    ]
+)
+NEW_ALARM_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("🔔 آلارم قیمت", callback_data="alert_price")],
+        [InlineKeyboardButton("📈 آلارم RSI", callback_data="alert_rsi")],
+        [BACK_TO_MAIN_BUTTON],
+    ]
+)
+BACK_TO_MAIN_KEYBOARD = InlineKeyboardMarkup([[BACK_TO_MAIN_BUTTON]])
+RSI_CONDITION_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("⬆️ بالاتر از", callback_data="rsi_above")],
+        [InlineKeyboardButton("⬇️ پایین‌تر از", callback_data="rsi_below")],
+    ]
+)
 
 
 # --- Safe Message Sending Wrappers ---
@@ -22,12 +111,29 @@ async def send_message(
     context: ContextTypes.DEFAULT_TYPE, chat_id: int, text: str, **kwargs
 ):
     """A wrapper to safely send messages, handling potential NetworkErrors."""
-    try:
-        message = await context.bot.send_message(chat_id=chat_id, text=text, **kwargs)
-        return message
-    except NetworkError as e:
-        logger.error(f"Failed to send message to {chat_id} due to network error: {e}")
-        return None
+    for delay in (*SEND_RETRY_DELAYS, None):
+        try:
+            message = await context.bot.send_message(
+                chat_id=chat_id, text=text, **kwargs
+            )
+            return message
+        except TimedOut as e:
+            if delay is None:
+                logger.error(
+                    "Failed to send message to %s after retries: %s", chat_id, e
+                )
+                return None
+            logger.warning(
+                "Timed out sending message to %s. Retrying in %s seconds...",
+                chat_id,
+                delay,
+            )
+            await asyncio.sleep(delay)
+        except NetworkError as e:
+            logger.error(
+                "Failed to send message to %s due to network error: %s", chat_id, e
+            )
+            return None
 
 
 async def edit_message(query_or_msg, text: str, **kwargs):
@@ -40,32 +146,28 @@ async def edit_message(query_or_msg, text: str, **kwargs):
             await query_or_msg.edit_text(text=text, **kwargs)
         return True
     except NetworkError as e:
-        logger.error(f"Failed to edit message due to network error: {e}")
+        logger.error("Failed to edit message due to network error: %s", e)
         return False
     except BadRequest as e:
         if "message is not modified" in str(e).lower():
-            logger.warning(f"Attempted to edit message with the same content: {e}")
+            logger.warning("Attempted to edit message with the same content: %s", e)
         else:
-            logger.error(f"Failed to edit message due to a bad request: {e}")
+            logger.error("Failed to edit message due to a bad request: %s", e)
         return False
 
 
 # --- Reminder Command ---
-async def _send_reminder(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, seconds: int, message: str
-):
-    """Waits for a specified duration and then sends the reminder message."""
-    await asyncio.sleep(seconds)
-    await send_message(context, update.effective_chat.id, f"⏰ یادآوری:\n\n{message}")
-    msg_logger.info(
-        f"OUTGOING (Reminder) -> User: {update.effective_user.id}, Message: {message}"
-    )
+async def _reminder_job(context: ContextTypes.DEFAULT_TYPE):
+    """JobQueue callback that sends a due reminder."""
+    chat_id, user_id, message = context.job.data
+    await send_message(context, chat_id, f"⏰ یادآوری:\n\n{message}")
+    msg_logger.info("OUTGOING (Reminder) -> User: %s, Message: %s", user_id, message)
 
 
 async def remind_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Sets a reminder for the user."""
     user_id = update.effective_user.id
-    msg_logger.info(f"INCOMING -> User: {user_id}, Command: /remind")
+    msg_logger.info("INCOMING -> User: %s, Command: /remind", user_id)
 
     if len(context.args) < 2:
         await send_message(
@@ -78,7 +180,6 @@ async def remind_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     duration_str = context.args[0]
-    reminder_message = " ".join(context.args[1:])
     seconds = parse_duration(duration_str)
 
     if seconds <= 0:
@@ -91,19 +192,30 @@ async def remind_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    asyncio.create_task(_send_reminder(update, context, seconds, reminder_message))
+    reminder_message = " ".join(context.args[1:])
+    # Scheduled as a job so a pending reminder holds only its data, not a
+    # sleeping task with the whole Update
+    context.job_queue.run_once(
+        _reminder_job,
+        seconds,
+        data=(update.effective_chat.id, user_id, reminder_message),
+        name=f"reminder:{user_id}",
+    )
     await send_message(
         context, user_id, f"✅ ثبت شد! تا {duration_str} دیگر به شما یادآوری می‌شود."
     )
     msg_logger.info(
-        f"SET Reminder -> User: {user_id}, Duration: {seconds}s, Message: {reminder_message}"
+        "SET Reminder -> User: %s, Duration: %ss, Message: %s",
+        user_id,
+        seconds,
+        reminder_message,
     )
 
 
 # --- General Commands ---
 async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    msg_logger.info(f"INCOMING -> User: {user_id}, Command: /summary")
+    msg_logger.info("INCOMING -> User: %s, Command: /summary", user_id)
 
     loading_message = await send_message(
         context, user_id, "🔍 در حال دریافت قیمت‌های درخواستی..."
@@ -111,54 +223,49 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not loading_message:
         return
 
-    target_symbols = [
-        "BTCUSDT",
-        "ETHUSDT",
-        "XRPUSDT",
-        "BNBUSDT",
-        "SOLUSDT",
-        "DOGEUSDT",
-        "TRXUSDT",
-        "ADAUSDT",
-        "AVAXUSDT",
-        "BCHUSDT",
-        "LINKUSDT",
-        "USDCUSDT",
-    ]
-    symbols_param = ",".join(target_symbols)
-    url = f"{config.BITUNIX_API_URL}/futures/market/tickers"
-    params = {"symbols": symbols_param}
-
     try:
-        api_response = await asyncio.to_thread(
-            requests.get, url, params=params, timeout=10
-        )
-        api_response.raise_for_status()
-        tickers_data = api_response.json().get("data", [])
+        # Prices come from the WebSocket feed these symbols are pinned to;
+        # only symbols it hasn't delivered yet fall back to the REST API
+        price_map = {
+            symbol: config.LATEST_PRICES[symbol]
+            for symbol in config.SUMMARY_SYMBOLS
+            if symbol in config.LATEST_PRICES
+        }
+        missing_symbols = [s for s in config.SUMMARY_SYMBOLS if s not in price_map]
+        if missing_symbols:
+            try:
+                tickers_data = await asyncio.wait_for(
+                    get_tickers(",".join(missing_symbols)), SUMMARY_FETCH_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                # Answer with the streamed prices; the rest show as N/A
+                logger.warning(
+                    "Timed out fetching summary tickers for %s", missing_symbols
+                )
+                tickers_data = []
+            price_map.update(
+                {t["symbol"]: float(t.get("lastPrice", 0)) for t in tickers_data}
+            )
 
-        if not tickers_data:
+        if not price_map:
             await edit_message(
                 loading_message, "❌ اطلاعاتی از بازار دریافت نشد (API response empty)."
             )
             return
 
-        price_map = {ticker["symbol"]: ticker for ticker in tickers_data}
-        message_lines = ["📈 خلاصه قیمت ارزهای درخواستی:\n"]
-        for symbol in target_symbols:
-            display_symbol = symbol.replace("USDT", "-USDT")
-            if symbol in price_map:
-                price = float(price_map[symbol].get("lastPrice", 0))
-                formatted_price = f"{price:,.4f}"
-                message_lines.append(f"🔹 {display_symbol}: {formatted_price}")
-            else:
-                message_lines.append(f"🔸 {display_symbol}: (N/A)")
-
-        final_message = "\n".join(message_lines)
+        final_message = "📈 خلاصه قیمت ارزهای درخواستی:\n\n" + "\n".join(
+            (
+                f"🔹 {display_symbol}: {price:,.4f}"
+                if (price := price_map.get(symbol)) is not None
+                else f"🔸 {display_symbol}: (N/A)"
+            )
+            for symbol, display_symbol in SUMMARY_DISPLAY
+        )
         await edit_message(loading_message, final_message)
-        msg_logger.info(f"OUTGOING (EDIT) -> User: {user_id}, Sent custom summary.")
+        msg_logger.info("OUTGOING (EDIT) -> User: %s, Sent custom summary.", user_id)
 
-    except requests.RequestException as e:
-        logger.error(f"Network error during summary fetch: {e}")
+    except httpx.HTTPError as e:
+        logger.error("Network error during summary fetch: %s", e)
         await edit_message(loading_message, "❌ خطای شبکه در دریافت اطلاعات.")
     except Exception as e:
         logger.exception("UNEXPECTED ERROR in summary_command:")
@@ -167,39 +274,19 @@ async def summary_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    msg_logger.info(f"INCOMING -> User: {user_id}, Command: /help")
-    help_text = dedent(
-        """
-        🆘 راهنمای ربات Crypto Alarm Bot
-
-        در اینجا لیستی از تمام دستورات و ویژگی‌های موجود آمده است:
-
-        دستورات اصلی:
-        /start - نمایش منوی اصلی و شروع کار با ربات
-        /help - نمایش همین پیام راهنما
-
-        دستورات سریع:
-        /new_alarm - شروع فرآیند ایجاد یک آلارم جدید
-        /list_alarms - نمایش تمام آلارم‌های فعال شما
-        /summary - نمایش قیمت لحظه‌ای ارزهای منتخب
-        /remind <زمان> <پیام> - تنظیم یک یادآوری ساده (مثال: /remind 1h30m پیام تست)
-
-        در طول فرآیندها:
-        /cancel - لغو عملیات فعلی (مانند ساخت آلارم)
-    """
-    )
-    await send_message(context, user_id, help_text)
-    msg_logger.info(f"OUTGOING -> User: {user_id}, Sent help message.")
+    msg_logger.info("INCOMING -> User: %s, Command: /help", user_id)
+    await send_message(context, user_id, HELP_TEXT)
+    msg_logger.info("OUTGOING -> User: %s, Sent help message.", user_id)
 
 
 # --- Main Conversation Flow ---
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     msg_logger.info(
-        f"INCOMING -> User: {user.id}, Command: /start or callback 'back_to_main'"
+        "INCOMING -> User: %s, Command: /start or callback 'back_to_main'", user.id
     )
     is_allowed = user.id in config.ALLOWED_USERS
-    db.add_user(user.id, user.username, user.first_name, is_allowed)
+    await db.add_user(user.id, user.username, user.first_name, is_allowed)
 
     if not is_allowed:
         await send_message(
@@ -207,23 +294,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return ConversationHandler.END
 
-    keyboard = [
-        [InlineKeyboardButton("🔔 ایجاد آلارم جدید", callback_data="new_alert")],
-        [InlineKeyboardButton("📋 مشاهده آلارم‌ها", callback_data="view_alerts")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    welcome_msg = dedent(
-        f"""
-        🔔 خوش آمدید به Crypto Alarm Bot! 🎉
-        👋 سلام {user.first_name}!
-
-        برای شروع از دکمه‌ها استفاده کنید یا از دستورات سریع زیر کمک بگیرید:
-        /new_alarm - ساخت آلارم جدید
-        /list_alarms - مشاهده آلارم‌ها
-        /summary - قیمت لحظه‌ای ارزها
-        /help - راهنما
-    """
-    )
+    reply_markup = MAIN_MENU_KEYBOARD
+    welcome_msg = WELCOME_TEMPLATE.format(first_name=user.first_name)
 
     if update.message:
         await send_message(context, user.id, welcome_msg, reply_markup=reply_markup)
@@ -231,121 +303,105 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await edit_message(
             update.callback_query, welcome_msg, reply_markup=reply_markup
         )
-    msg_logger.info(f"OUTGOING -> User: {user.id}, Sent welcome message.")
+    msg_logger.info("OUTGOING -> User: %s, Sent welcome message.", user.id)
     return MAIN_MENU
 
 
 async def new_alarm_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    msg_logger.info(f"INCOMING -> User: {user_id}, Command: /new_alarm")
-    keyboard = [
-        [InlineKeyboardButton("🔔 آلارم قیمت", callback_data="alert_price")],
-        [InlineKeyboardButton("📈 آلارم RSI", callback_data="alert_rsi")],
-        [InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")],
-    ]
+    msg_logger.info("INCOMING -> User: %s, Command: /new_alarm", user_id)
     await send_message(
         context,
         user_id,
         "🔔 نوع آلارم را انتخاب کنید:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=NEW_ALARM_KEYBOARD,
     )
     return ALERT_TYPE
 
 
+@lru_cache(maxsize=512)
+def _alert_button(alert: AlertSummary) -> InlineKeyboardButton:
+    """Builds an alert's button; unchanged alerts reuse the same instance."""
+    if alert.alert_type == "alert_rsi":
+        value = f"RSI {alert.rsi_threshold}"
+    else:
+        value = alert.price
+    return InlineKeyboardButton(
+        f"🔔 {alert.pair} - {translate_alert_type(alert.alert_type)} - {value}",
+        callback_data=f"alert_{alert.id}",
+    )
+
+
+def _alert_list_view(
+    alerts: List[AlertSummary], with_back: bool = False
+) -> Tuple[str, InlineKeyboardMarkup]:
+    """
+    Builds the view-alerts header and keyboard, optionally ending the
+    keyboard with a back button.
+    """
+    keyboard = [[_alert_button(alert)] for alert in alerts]
+    if with_back:
+        keyboard.append([BACK_TO_MAIN_BUTTON])
+    return f"📋 آلارم‌های فعال شما ({len(alerts)}):", InlineKeyboardMarkup(keyboard)
+
+
 async def list_alarms_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    msg_logger.info(f"INCOMING -> User: {user_id}, Command: /list_alarms")
-    alerts = db.get_user_alerts(
-        user_id, ["id", "pair", "alert_type", "price", "rsi_threshold"]
-    )
+    msg_logger.info("INCOMING -> User: %s, Command: /list_alarms", user_id)
+    alerts = await db.get_user_alert_summaries(user_id)
 
     if not alerts:
         await send_message(context, user_id, "📭 هیچ آلارم فعالی ندارید!")
         return ConversationHandler.END
 
-    keyboard = []
-    for alert in alerts:
-        if alert["alert_type"] == "alert_rsi":
-            value = f"RSI {alert['rsi_threshold']}"
-        else:
-            value = alert["price"]
-        btn_text = f"🔔 {alert['pair']} - {translate_alert_type(alert['alert_type'])} - {value}"
-        keyboard.append(
-            [InlineKeyboardButton(btn_text, callback_data=f"alert_{alert['id']}")]
-        )
-    await send_message(
-        context,
-        user_id,
-        f"📋 آلارم‌های فعال شما ({len(alerts)}):",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-    )
+    text, reply_markup = _alert_list_view(alerts)
+    await send_message(context, user_id, text, reply_markup=reply_markup)
     return VIEW_ALERT
 
 
 async def main_menu_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = query.from_user.id
-    msg_logger.info(f"INCOMING (Callback) -> User: {user_id}, Data: {query.data}")
+    msg_logger.info("INCOMING (Callback) -> User: %s, Data: %s", user_id, query.data)
     await query.answer()
 
     if query.data == "new_alert":
-        keyboard = [
-            [InlineKeyboardButton("🔔 آلارم قیمت", callback_data="alert_price")],
-            [InlineKeyboardButton("📈 آلارم RSI", callback_data="alert_rsi")],
-            [InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")],
-        ]
         await edit_message(
             query,
             "🔔 نوع آلارم را انتخاب کنید:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=NEW_ALARM_KEYBOARD,
         )
         return ALERT_TYPE
     elif query.data == "view_alerts":
-        alerts = db.get_user_alerts(
-            user_id, ["id", "pair", "alert_type", "price", "rsi_threshold"]
-        )
+        alerts = await db.get_user_alert_summaries(user_id)
         if not alerts:
-            keyboard = [
-                [InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")]
-            ]
             await edit_message(
                 query,
                 "📭 هیچ آلارم فعالی ندارید!",
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                reply_markup=BACK_TO_MAIN_KEYBOARD,
             )
             return MAIN_MENU
 
-        keyboard = []
-        for alert in alerts:
-            if alert["alert_type"] == "alert_rsi":
-                value = f"RSI {alert['rsi_threshold']}"
-            else:
-                value = alert["price"]
-            btn_text = f"🔔 {alert['pair']} - {translate_alert_type(alert['alert_type'])} - {value}"
-            keyboard.append(
-                [InlineKeyboardButton(btn_text, callback_data=f"alert_{alert['id']}")]
-            )
-        keyboard.append(
-            [InlineKeyboardButton("🔙 بازگشت", callback_data="back_to_main")]
-        )
-        await edit_message(
-            query,
-            f"📋 آلارم‌های فعال شما ({len(alerts)}):",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-        )
+        text, reply_markup = _alert_list_view(alerts, with_back=True)
+        await edit_message(query, text, reply_markup=reply_markup)
         return VIEW_ALERT
 
 
+def _callback_alert_id(data: str) -> int:
+    """Extracts the alert id from callbacks like 'alert_7' or 'back_to_details_7'."""
+    return int(data.rpartition("_")[2])
+
+
 async def view_alert_details_handler(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ):
     query = update.callback_query
     await query.answer()
 
-    alert_id = int(query.data.split("_")[-1])
+    alert_id = _callback_alert_id(query.data)
     context.user_data["selected_alert_id"] = alert_id
     user_id = query.from_user.id
-    alert = db.get_alert_by_id(user_id, alert_id)
+    alert = await db.get_alert_by_id(user_id, alert_id)
 
     if not alert:
         await edit_message(query, "❌ آلارم یافت نشد.")
@@ -362,29 +418,34 @@ async def view_alert_details_handler(
     return VIEW_ALERT_DETAILS
 
 
+async def _delete_trigger_message(
+    context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int
+):
+    """Deletes the last trigger message of a removed alert, if still possible."""
+    try:
+        await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
+    except (BadRequest, NetworkError) as e:
+        logger.warning("Could not delete trigger message %s: %s", message_id, e)
+
+
 async def delete_confirmation_handler(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ):
     query = update.callback_query
     await query.answer()
-    alert_id = int(query.data.split("_")[-1])
+    alert_id = _callback_alert_id(query.data)
     user_id = query.from_user.id
 
-    alert_data = db.get_alert_by_id(user_id, alert_id)
     stop_alarm_task(alert_id)
-    success, message = db.delete_user_alert(user_id, alert_id)
-
-    await edit_message(query, message)
+    alert_data, message = await db.pop_user_alert(user_id, alert_id)
 
-    if success and alert_data and alert_data.get("last_message_id"):
-        try:
-            await context.bot.delete_message(
-                chat_id=user_id, message_id=alert_data["last_message_id"]
-            )
-        except (BadRequest, NetworkError) as e:
-            logger.warning(
-                f"Could not delete trigger message {alert_data['last_message_id']}: {e}"
-            )
+    # The confirmation edit and the trigger message cleanup are independent
+    pending = [edit_message(query, message)]
+    if alert_data and alert_data.get("last_message_id"):
+        pending.append(
+            _delete_trigger_message(context, user_id, alert_data["last_message_id"])
+        )
+    await asyncio.gather(*pending)
 
     await start(update, context)  # This will implicitly handle MAIN_MENU return
     return ConversationHandler.END
@@ -409,12 +470,11 @@ async def alert_type_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def timeframe_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     timeframe = update.message.text.lower().strip()
-    valid_timeframes = ["1m", "5m", "15m", "30m", "1h", "2h", "4h", "6h", "12h", "1d"]
-    if timeframe not in valid_timeframes:
+    if timeframe not in VALID_TIMEFRAMES:
         await send_message(
             context,
             user_id,
-            f"❌ تایم فریم نامعتبر است. لطفاً یکی از این موارد را انتخاب کنید:\n{', '.join(valid_timeframes)}",
+            f"❌ تایم فریم نامعتبر است. لطفاً یکی از این موارد را انتخاب کنید:\n{', '.join(VALID_TIMEFRAMES)}",
         )
         return TIMEFRAME_INPUT
 
@@ -429,7 +489,7 @@ async def pair_input_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = update.effective_user.id
     pair = update.message.text.upper().strip()
 
-    valid = await asyncio.to_thread(is_valid_pair, pair)
+    valid = await is_valid_pair(pair)
     if not valid:
         await send_message(
             context,
@@ -458,15 +518,11 @@ async def rsi_period_input_handler(update: Update, context: ContextTypes.DEFAULT
         if not 2 <= period <= 100:
             raise ValueError
         context.user_data["rsi_period"] = period
-        keyboard = [
-            [InlineKeyboardButton("⬆️ بالاتر از", callback_data="rsi_above")],
-            [InlineKeyboardButton("⬇️ پایین‌تر از", callback_data="rsi_below")],
-        ]
         await send_message(
             context,
             user_id,
             "شرط RSI را انتخاب کنید:",
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=RSI_CONDITION_KEYBOARD,
         )
         return RSI_CONDITION_INPUT
     except (ValueError, TypeError):
@@ -479,7 +535,8 @@ async def rsi_period_input_handler(update: Update, context: ContextTypes.DEFAULT
 async def rsi_condition_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    context.user_data["rsi_condition"] = query.data.split("_")[1]  # 'above' or 'below'
+    condition = query.data.rpartition("_")[2]  # 'above' or 'below'
+    context.user_data["rsi_condition"] = condition
     await edit_message(query, "🎯 لطفاً مقدار آستانه RSI را وارد کنید (بین 0 تا 100):")
     return RSI_THRESHOLD_INPUT
 
@@ -539,17 +596,25 @@ async def save_alert_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     context.user_data["user_id"] = user_id
 
+    # A price alert without a WebSocket feed could never fire, so refuse it
+    is_price_alert = context.user_data.get("alert_type") == "alert_price"
+    if is_price_alert and not ws_client.can_subscribe(context.user_data["pair"]):
+        await send_message(
+            context,
+            user_id,
+            "❌ ظرفیت پایش قیمت پر است و آلارم برای این جفت‌ارز ثبت نشد. لطفاً بعداً دوباره تلاش کنید.",
+        )
+        context.user_data.clear()
+        await start(update, context)
+        return ConversationHandler.END
+
     # Save the alert to the database
-    alert_id = db.save_alert(context.user_data)
-
-    if alert_id:
-        full_alert_data = db.get_alert_by_id(user_id, alert_id)
-        if full_alert_data:
-            await start_alarm_task(context.application, full_alert_data)
-            message_text = f"✅ آلارم با موفقیت ایجاد شد!\n\n{AlertManager.format_alert_details(full_alert_data)}"
-            await send_message(context, user_id, message_text)
-        else:
-            await send_message(context, user_id, "❌ خطا در بازیابی آلارم پس از ذخیره.")
+    alert = await db.save_alert(context.user_data)
+
+    if alert:
+        await start_alarm_task(context.application, alert)
+        message_text = f"✅ آلارم با موفقیت ایجاد شد!\n\n{AlertManager.format_alert_details(alert)}"
+        await send_message(context, user_id, message_text)
     else:
         await send_message(
             context, user_id, "❌ خطا در ذخیره آلارم. لطفاً دوباره تلاش کنید."
@@ -1,24 +1,165 @@
 import asyncio
-from typing import Dict, Any
+import operator
+import time
+from typing import Dict, Any, NamedTuple, Optional
 
-from telegram.ext import Application
+import numpy as np
+from telegram.ext import Application, ContextTypes
 from telegram.error import BadRequest
 
 import config
 from api_manager import ws_client
-from bot.data_fetcher import get_kline_data, calculate_rsi
-from database_manager import DatabaseManager
+from bot.data_fetcher import get_all_symbols, get_kline_data, calculate_rsi
+from database_manager import db
 from logging_config import logger, api_logger, msg_logger
 from bot.ui import AlertManager
 
-db = DatabaseManager(config.DB_FILE)
+# Seconds between kline fetches for each RSI (pair, timeframe) job
+RSI_CHECK_INTERVAL = 60
+
+# Seconds to wait past a candle boundary so the exchange has closed the candle
+RSI_CLOSE_GRACE = 1
+
+# Seconds between reloads of the exchange's symbol list
+SYMBOLS_REFRESH_INTERVAL = 300
+
+# Caps concurrent trigger sends; a price crossing can fire many alerts at once
+MAX_CONCURRENT_TRIGGERS = 10
+_trigger_semaphore = asyncio.Semaphore(MAX_CONCURRENT_TRIGGERS)
+
+# The last tick boundary each RSI (pair, timeframe) job evaluated
+_last_rsi_tick: Dict[tuple, int] = {}
+
+# RSI condition -> (predicate(current_rsi, threshold), trigger reason template)
+RSI_CONDITIONS = {
+    "above": (operator.gt, "📈 RSI ({rsi:.2f}) از {threshold} بالاتر رفت!"),
+    "below": (operator.lt, "📉 RSI ({rsi:.2f}) از {threshold} پایین تر آمد!"),
+}
+
+
+class RsiAlertSpec(NamedTuple):
+    """Immutable snapshot of the fields an RSI check reads on every tick."""
+
+    alert_id: int
+    user_id: int
+    rsi_period: int
+    rsi_condition: str
+    rsi_threshold: float
+
+    @classmethod
+    def from_alert(cls, alert_data: Dict[str, Any]) -> "RsiAlertSpec":
+        return cls(
+            alert_id=alert_data["id"],
+            user_id=alert_data["user_id"],
+            rsi_period=alert_data["rsi_period"],
+            rsi_condition=alert_data["rsi_condition"],
+            rsi_threshold=float(alert_data["rsi_threshold"]),
+        )
+
+
+class PriceAlertSpec(NamedTuple):
+    """Immutable snapshot of the fields a price check reads on every tick."""
+
+    alert_id: int
+    user_id: int
+    target_price: float
+
+    @classmethod
+    def from_alert(cls, alert_data: Dict[str, Any]) -> "PriceAlertSpec":
+        return cls(
+            alert_id=alert_data["id"],
+            user_id=alert_data["user_id"],
+            target_price=float(alert_data["price"]),
+        )
+
+
+def _acquire_price_feed(pair: str) -> asyncio.Event:
+    """Registers a price monitor for `pair` and returns its update event."""
+    config.PRICE_SUBSCRIBERS[pair] = config.PRICE_SUBSCRIBERS.get(pair, 0) + 1
+    if not ws_client.add_subscription(pair):
+        logger.error(f"No price feed for {pair}: WebSocket subscription limit hit")
+    return config.PRICE_EVENTS.setdefault(pair, asyncio.Event())
+
+
+def _release_price_feed(pair: str):
+    """Unregisters a price monitor, unsubscribing once nobody watches `pair`."""
+    remaining = config.PRICE_SUBSCRIBERS.get(pair, 0) - 1
+    if remaining > 0:
+        config.PRICE_SUBSCRIBERS[pair] = remaining
+        return
+    config.PRICE_SUBSCRIBERS.pop(pair, None)
+    config.PRICE_EVENTS.pop(pair, None)
+    ws_client.remove_subscription(pair)
+
+
+def _seconds_until_next_tick() -> float:
+    """
+    Seconds until just after the next RSI tick boundary, so each fetch lands
+    right after a candle closes instead of at an arbitrary offset.
+    """
+    return RSI_CHECK_INTERVAL - time.time() % RSI_CHECK_INTERVAL + RSI_CLOSE_GRACE
+
+
+def pin_summary_prices():
+    """Keeps the /summary symbols subscribed on the WebSocket feed for good."""
+    for pair in config.SUMMARY_SYMBOLS:
+        _acquire_price_feed(pair)
+
+
+async def refresh_valid_symbols(context: Optional[ContextTypes.DEFAULT_TYPE] = None):
+    """Reloads the cached exchange symbols; keeps the old set if the fetch fails."""
+    try:
+        symbols = await get_all_symbols()
+    except Exception as e:
+        # A malformed payload must not kill the job; pair input falls back
+        # to a REST lookup while the set is empty
+        logger.warning(f"Could not refresh the valid symbol list: {e}")
+        return
+    if symbols:
+        config.VALID_SYMBOLS = symbols
+        logger.info(f"Loaded {len(symbols)} valid symbols from the exchange.")
+    else:
+        logger.warning("Could not refresh the valid symbol list.")
+
+
+def start_symbol_refresh(application: Application):
+    """Schedules the symbol list to load right away and refresh periodically."""
+    # Runs on the job queue so a slow exchange never delays startup
+    application.job_queue.run_repeating(
+        refresh_valid_symbols,
+        interval=SYMBOLS_REFRESH_INTERVAL,
+        first=0,
+        name="refresh_valid_symbols",
+    )
+
+
+def _forget_task(pair: str, task: asyncio.Task):
+    """Done-callback that unregisters a finished task, unless already replaced."""
+    if config.PRICE_GROUP_TASKS.get(pair) is task:
+        del config.PRICE_GROUP_TASKS[pair]
 
 
 def stop_alarm_task(alert_id: int):
-    task = config.ACTIVE_ALARM_TASKS.pop(alert_id, None)
-    if task:
-        task.cancel()
-        logger.info(f"Cancelled alarm task for alert_id: {alert_id}")
+    # Price alerts share one task per pair, which is cancelled with its last alert
+    for pair, group in config.PRICE_ALERT_GROUPS.items():
+        if group.pop(alert_id, None) is not None:
+            if not group:
+                del config.PRICE_ALERT_GROUPS[pair]
+                task = config.PRICE_GROUP_TASKS.pop(pair, None)
+                if task:
+                    task.cancel()
+                    logger.info(f"Cancelled price task for pair: {pair}")
+            logger.info(f"Removed alert_id: {alert_id} from price group {pair}")
+            return
+
+    # RSI alerts share one job per (pair, timeframe); just leave the group.
+    # The group job removes itself once the group is empty.
+    for key, group in config.RSI_ALERT_GROUPS.items():
+        if group.pop(alert_id, None) is not None:
+            if not group:
+                del config.RSI_ALERT_GROUPS[key]
+            logger.info(f"Removed alert_id: {alert_id} from RSI group {key}")
+            return
 
 
 async def start_alarm_task(application: Application, alert_data: Dict[str, Any]):
@@ -29,173 +170,275 @@ async def start_alarm_task(application: Application, alert_data: Dict[str, Any])
 
     alert_type = alert_data.get("alert_type")
 
+    # Never leave an older monitor for the same alert running unreferenced
+    stop_alarm_task(alert_id)
+
     if alert_type == "alert_price":
-        # Ensure we have a WebSocket subscription for this pair
-        ws_client.add_subscription(alert_data["pair"])
-        task = asyncio.create_task(price_alert_monitor(application, alert_data))
+        pair = alert_data["pair"]
+        config.PRICE_ALERT_GROUPS.setdefault(pair, {})[alert_id] = (
+            PriceAlertSpec.from_alert(alert_data)
+        )
+        if pair not in config.PRICE_GROUP_TASKS:
+            task = asyncio.create_task(price_group_monitor(application, pair))
+            config.PRICE_GROUP_TASKS[pair] = task
+            task.add_done_callback(lambda t: _forget_task(pair, t))
+        logger.info(f"Added alert_id: {alert_id} to price group {pair}")
     elif alert_type == "alert_rsi":
-        task = asyncio.create_task(rsi_alert_monitor(application, alert_data))
+        key = (alert_data["pair"], alert_data["timeframe"])
+        config.RSI_ALERT_GROUPS.setdefault(key, {})[alert_id] = RsiAlertSpec.from_alert(
+            alert_data
+        )
+        job_name = f"rsi:{key[0]}:{key[1]}"
+        if not application.job_queue.get_jobs_by_name(job_name):
+            application.job_queue.run_repeating(
+                rsi_group_monitor,
+                interval=RSI_CHECK_INTERVAL,
+                first=_seconds_until_next_tick(),
+                name=job_name,
+                data=key,
+            )
+        logger.info(f"Added alert_id: {alert_id} to RSI group {key}")
     else:
         logger.warning(f"Unsupported alert_type for task start: {alert_type}")
-        return
-
-    config.ACTIVE_ALARM_TASKS[alert_id] = task
-    logger.info(f"Started '{alert_type}' task for alert_id: {alert_id}")
 
 
-async def rsi_alert_monitor(application: Application, alert_data: Dict[str, Any]):
-    user_id = alert_data["user_id"]
-    alert_id = alert_data["id"]
-    pair = alert_data["pair"]
-    timeframe = alert_data["timeframe"]
-    rsi_period = alert_data["rsi_period"]
-    rsi_condition = alert_data["rsi_condition"]
-    rsi_threshold = float(alert_data["price"])  # Using 'price' column for threshold
-
-    while True:
-        try:
-            current_alert_state = db.get_alert_by_id(user_id, alert_id)
-            if not current_alert_state or not current_alert_state["is_active"]:
-                logger.info(f"Alert {alert_id} is no longer active. Stopping task.")
-                stop_alarm_task(alert_id)
-                break
-
-            closing_prices = get_kline_data(pair, timeframe, limit=rsi_period + 100)
-
-            if closing_prices:
-                current_rsi = calculate_rsi(closing_prices, rsi_period)
-                if current_rsi is not None:
-                    triggered, reason = False, ""
-
-                    if rsi_condition == "above" and current_rsi > rsi_threshold:
-                        triggered = True
-                        reason = (
-                            f"📈 RSI ({current_rsi:.2f}) از {rsi_threshold} بالاتر رفت!"
-                        )
-                    elif rsi_condition == "below" and current_rsi < rsi_threshold:
-                        triggered = True
-                        reason = f"📉 RSI ({current_rsi:.2f}) از {rsi_threshold} پایین تر آمد!"
+async def rehydrate_alarms(application: Application):
+    """Restarts monitoring for every alert that was active before a restart."""
+    logger.info("--- Reloading active alerts from database ---")
+
+    active_alerts = await db.get_all_active_alerts()
+    # One pass collects the price pairs to subscribe and the tasks to start
+    price_alert_pairs = set()
+    starts = []
+    for alert in active_alerts:
+        if alert["alert_type"] == "alert_price":
+            price_alert_pairs.add(alert["pair"])
+        starts.append(start_alarm_task(application, alert))
+
+    ws_client.add_subscriptions(price_alert_pairs)
+    logger.info(
+        f"--- Queued WS subscriptions for {len(price_alert_pairs)} unique pairs ---"
+    )
+
+    await asyncio.gather(*starts)
+    logger.info(f"--- Successfully reloaded {len(active_alerts)} active alerts ---")
+
+
+async def _check_rsi_alert(
+    application: Application,
+    spec: RsiAlertSpec,
+    closing_prices: np.ndarray,
+    rsi_by_period: Dict[int, Optional[float]],
+):
+    """Evaluates one RSI alert against the klines fetched for its group."""
+    alert_id, user_id, rsi_period, rsi_condition, rsi_threshold = spec
+
+    # Alerts sharing a period share the same RSI value for this tick
+    if rsi_period not in rsi_by_period:
+        rsi_by_period[rsi_period] = calculate_rsi(closing_prices, rsi_period)
+    current_rsi = rsi_by_period[rsi_period]
+    if current_rsi is None:
+        return
 
-                    if triggered:
-                        # To prevent spamming, we will temporarily disable the alert after it triggers.
-                        # A more advanced implementation might re-enable it after a cooldown.
-                        db.update_alert_field(alert_id, "is_active", 0)
+    condition = RSI_CONDITIONS.get(rsi_condition)
+    if condition is None:
+        return
+    predicate, reason_template = condition
+
+    if predicate(current_rsi, rsi_threshold):
+        reason = reason_template.format(rsi=current_rsi, threshold=rsi_threshold)
+        # Shielded so a cancellation can't leave the alert disabled but unsent
+        await asyncio.shield(_fire_rsi_alert(application, spec, reason, current_rsi))
+
+
+async def _fire_rsi_alert(
+    application: Application, spec: RsiAlertSpec, reason: str, current_rsi: float
+):
+    """Disables a triggered RSI alert and sends its trigger message."""
+    alert_id, user_id = spec.alert_id, spec.user_id
+
+    # Group membership is the in-memory active flag; the row is only
+    # needed to render the trigger message
+    current_alert_state = await db.get_alert_by_id(user_id, alert_id)
+    if not current_alert_state or not current_alert_state["is_active"]:
+        logger.info(f"Alert {alert_id} is no longer active. Stopping task.")
+        stop_alarm_task(alert_id)
+        return
 
-                        new_trigger_count = (
-                            current_alert_state.get("trigger_count", 0) + 1
-                        )
-                        msg_text = AlertManager.format_trigger_message(
-                            current_alert_state,
-                            reason,
-                            current_rsi,
-                            new_trigger_count,
-                        )
-                        await application.bot.send_message(user_id, msg_text)
-                        logger.info(
-                            f"TRIGGERED (RSI) -> Alert ID: {alert_id} for User: {user_id}. Reason: {reason}"
-                        )
+    # To prevent spamming, we will temporarily disable the alert after it triggers.
+    # A more advanced implementation might re-enable it after a cooldown.
+    await db.delete_user_alert(user_id, alert_id)
+    stop_alarm_task(alert_id)
+
+    new_trigger_count = current_alert_state.get("trigger_count", 0) + 1
+    msg_text = AlertManager.format_trigger_message(
+        current_alert_state,
+        reason,
+        current_rsi,
+        new_trigger_count,
+    )
+    await application.bot.send_message(user_id, msg_text)
+    logger.info(
+        f"TRIGGERED (RSI) -> Alert ID: {alert_id} for User: {user_id}. Reason: {reason}"
+    )
+
+
+async def rsi_group_monitor(context: ContextTypes.DEFAULT_TYPE):
+    """
+    JobQueue callback that fetches klines once per tick for a (pair, timeframe)
+    and evaluates every RSI alert registered on it.
+    """
+    key = context.job.data
+    pair, timeframe = key
+
+    if not config.RSI_ALERT_GROUPS.get(key):
+        context.job.schedule_removal()
+        _last_rsi_tick.pop(key, None)
+        logger.info(f"No RSI alerts left for {key}. Removed its job.")
+        return
 
-                        # Since this alert type is now disabled, we stop the monitor task.
-                        stop_alarm_task(alert_id)
-                        break
+    # A late or repeated run inside an already evaluated boundary is a no-op
+    tick = int(time.time() // RSI_CHECK_INTERVAL)
+    if _last_rsi_tick.get(key) == tick:
+        return
+    _last_rsi_tick[key] = tick
 
-            # Check frequency based on timeframe to be efficient
-            await asyncio.sleep(60)  # Check every minute
+    specs = list(config.RSI_ALERT_GROUPS[key].values())
+    limit = max(spec.rsi_period for spec in specs) + 100
+    closing_prices = await get_kline_data(pair, timeframe, limit=limit)
+    if closing_prices is None:
+        return
 
-        except Exception as e:
-            logger.exception(
-                f"UNEXPECTED ERROR in rsi_alert_monitor for alert {alert_id}:"
+    rsi_by_period = {}
+    for spec in specs:
+        # Skip alerts removed while we were awaiting
+        if spec.alert_id not in config.RSI_ALERT_GROUPS.get(key, {}):
+            continue
+        try:
+            await _check_rsi_alert(
+                context.application, spec, closing_prices, rsi_by_period
             )
-            stop_alarm_task(alert_id)
-            break
-
-
-async def price_alert_monitor(application: Application, alert_data: Dict[str, Any]):
-    user_id = alert_data["user_id"]
-    pair = alert_data["pair"]
-    alert_id = alert_data["id"]
-    last_price = config.LATEST_PRICES.get(pair)
+        except Exception:
+            logger.exception(f"UNEXPECTED ERROR checking RSI alert {spec.alert_id}:")
+            stop_alarm_task(spec.alert_id)
+
+
+def _price_crossing_reason(
+    last_price: float, current_price: float, target_price: float
+) -> Optional[str]:
+    """Returns the trigger reason if the price crossed the target, else None."""
+    if last_price < target_price <= current_price:
+        return f"📈 قیمت به بالای {target_price} رسید!"
+    if last_price > target_price >= current_price:
+        return f"📉 قیمت به پایین {target_price} رسید!"
+    return None
+
+
+async def _fire_price_alert(
+    application: Application, spec: PriceAlertSpec, reason: str, current_price: float
+):
+    """Sends (or edits) the trigger message of a crossed price alert."""
+    alert_id, user_id, _ = spec
+
+    # Only a trigger touches the database; the row is usually cached
+    current_alert_state = await db.get_alert_by_id(user_id, alert_id)
+    if not current_alert_state or not current_alert_state["is_active"]:
+        logger.info(f"Alert {alert_id} is no longer active. Stopping task.")
+        stop_alarm_task(alert_id)
+        return
 
-    while True:
+    new_trigger_count = current_alert_state.get("trigger_count", 0) + 1
+    msg_text = AlertManager.format_trigger_message(
+        current_alert_state,
+        reason,
+        current_price,
+        new_trigger_count,
+    )
+    last_message_id = current_alert_state.get("last_message_id")
+    new_message = None
+
+    logger.info(
+        f"TRIGGERED (Price) -> Alert ID: {alert_id} for User: {user_id}. Reason: {reason}"
+    )
+
+    if last_message_id:
         try:
-            current_alert_state = db.get_alert_by_id(user_id, alert_id)
-            if not current_alert_state or not current_alert_state["is_active"]:
-                logger.info(f"Alert {alert_id} is no longer active. Stopping task.")
-                stop_alarm_task(alert_id)
-                break
+            await application.bot.edit_message_text(
+                chat_id=user_id,
+                message_id=last_message_id,
+                text=msg_text,
+            )
+            msg_logger.info(
+                f"OUTGOING (EDIT) -> User: {user_id}, Message ID: {last_message_id}"
+            )
+        except BadRequest as e:
+            if "message to edit not found" in e.message.lower():
+                new_message = await application.bot.send_message(user_id, msg_text)
+                msg_logger.info(
+                    f"OUTGOING (SEND - after edit fail) -> User: {user_id}, New Message ID: {new_message.message_id}"
+                )
+            else:
+                raise e
+    else:
+        new_message = await application.bot.send_message(user_id, msg_text)
+        msg_logger.info(
+            f"OUTGOING (SEND) -> User: {user_id}, New Message ID: {new_message.message_id}"
+        )
+
+    message_id_to_save = new_message.message_id if new_message else last_message_id
+    await db.update_alert_trigger_info(alert_id, message_id_to_save)
+
+
+async def _check_price_alert(
+    application: Application, spec: PriceAlertSpec, reason: str, current_price: float
+):
+    """Fires one crossed alert, dropping it from its group if that fails."""
+    try:
+        async with _trigger_semaphore:
+            await _fire_price_alert(application, spec, reason, current_price)
+    except Exception:
+        logger.exception(f"UNEXPECTED ERROR firing price alert {spec.alert_id}:")
+        stop_alarm_task(spec.alert_id)
+
+
+async def price_group_monitor(application: Application, pair: str):
+    """
+    Evaluates every price alert on `pair` each time the WebSocket client
+    pushes a new price, so work scales with price updates, not alert count.
+    """
+    price_event = _acquire_price_feed(pair)
+    last_price = config.LATEST_PRICES.get(pair)
 
-            target_price = float(current_alert_state["price"])
+    try:
+        while True:
+            # Sleep until the WebSocket client pushes a new price for this pair
+            await price_event.wait()
             current_price = config.LATEST_PRICES.get(pair)
-
-            if current_price:
-                triggered, reason = False, ""
-
-                if last_price is not None:
-                    if last_price < target_price and current_price >= target_price:
-                        triggered, reason = (
-                            True,
-                            f"📈 قیمت به بالای {target_price} رسید!",
-                        )
-                    elif last_price > target_price and current_price <= target_price:
-                        triggered, reason = (
-                            True,
-                            f"📉 قیمت به پایین {target_price} رسید!",
-                        )
-
-                if triggered:
-                    new_trigger_count = current_alert_state.get("trigger_count", 0) + 1
-                    msg_text = AlertManager.format_trigger_message(
-                        current_alert_state,
-                        reason,
-                        current_price,
-                        new_trigger_count,
-                    )
-                    last_message_id = current_alert_state.get("last_message_id")
-                    new_message = None
-
-                    logger.info(
-                        f"TRIGGERED (Price) -> Alert ID: {alert_id} for User: {user_id}. Reason: {reason}"
+            if not current_price:
+                continue
+
+            if last_price is not None:
+                crossed = []
+                for spec in config.PRICE_ALERT_GROUPS.get(pair, {}).values():
+                    reason = _price_crossing_reason(
+                        last_price, current_price, spec.target_price
                     )
-
-                    if last_message_id:
-                        try:
-                            await application.bot.edit_message_text(
-                                chat_id=user_id,
-                                message_id=last_message_id,
-                                text=msg_text,
-                            )
-                            msg_logger.info(
-                                f"OUTGOING (EDIT) -> User: {user_id}, Message ID: {last_message_id}"
-                            )
-                        except BadRequest as e:
-                            if "message to edit not found" in e.message.lower():
-                                new_message = await application.bot.send_message(
-                                    user_id, msg_text
+                    if reason:
+                        crossed.append((spec, reason))
+                if crossed:
+                    # Shielded so cancelling this task (its last alert was
+                    # deleted) can't cut a send off before its DB update
+                    await asyncio.gather(
+                        *(
+                            asyncio.shield(
+                                _check_price_alert(
+                                    application, spec, reason, current_price
                                 )
-                                msg_logger.info(
-                                    f"OUTGOING (SEND - after edit fail) -> User: {user_id}, New Message ID: {new_message.message_id}"
-                                )
-                            else:
-                                raise e
-                    else:
-                        new_message = await application.bot.send_message(
-                            user_id, msg_text
-                        )
-                        msg_logger.info(
-                            f"OUTGOING (SEND) -> User: {user_id}, New Message ID: {new_message.message_id}"
+                            )
+                            for spec, reason in crossed
                         )
-
-                    message_id_to_save = (
-                        new_message.message_id if new_message else last_message_id
                     )
-                    db.update_alert_trigger_info(alert_id, message_id_to_save)
 
-                last_price = current_price
-
-            await asyncio.sleep(1)  # Check every second
-        except Exception as e:
-            logger.exception(
-                f"UNEXPECTED ERROR in price_alert_monitor for alert {alert_id}:"
-            )
-            stop_alarm_task(alert_id)
-            break
+            last_price = current_price
+    finally:
+        _release_price_feed(pair)
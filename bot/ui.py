@@ -3,6 +3,58 @@ from typing import Dict, Any
 
 from bot.utils import translate_alert_type
 
+# Message templates are dedented once at import time; rendering is then a
+# single str.format call instead of a dedent pass per message.
+_RSI_DETAILS_TEMPLATE = dedent(
+    """
+    جفت ارز: #{pair}
+    نوع: {alert_type}
+    تایم فریم: {timeframe}
+    دوره RSI: {rsi_period}
+    شرط: RSI {condition_text} {threshold}
+    متن: {description}
+    """
+)
+
+_PRICE_DETAILS_TEMPLATE = dedent(
+    """
+    جفت ارز: #{pair}
+    نوع: {alert_type}
+    قیمت: {price}
+    متن: {description}
+    """
+)
+
+_RSI_TRIGGER_TEMPLATE = dedent(
+    """
+    🔔 آلارم RSI فعال شد! 🔔
+
+    {trigger_reason}
+
+    جفت ارز: #{pair}
+    تایم فریم: {timeframe}
+    RSI فعلی: {current_value:.2f}
+    متن: {description}
+
+    🔄 تعداد تکرار: {trigger_count}
+    """
+)
+
+_PRICE_TRIGGER_TEMPLATE = dedent(
+    """
+    🔔 آلارم قیمت فعال شد! 🔔
+
+    {trigger_reason}
+
+    جفت ارز: #{pair}
+    قیمت هدف: {target_price}
+    قیمت فعلی: {current_value}
+    متن: {description}
+
+    🔄 تعداد تکرار: {trigger_count}
+    """
+)
+
 
 class AlertManager:
     @staticmethod
@@ -14,24 +66,21 @@ class AlertManager:
                 if alert_data.get("rsi_condition") == "above"
                 else "پایین تر از"
             )
-            return dedent(
-                f"""
-                جفت ارز: #{alert_data.get('pair', 'N/A')}
-                نوع: {translate_alert_type(alert_type)}
-                تایم فریم: {alert_data.get('timeframe', 'N/A')}
-                دوره RSI: {alert_data.get('rsi_period', 'N/A')}
-                شرط: RSI {condition_text} {alert_data.get('price')}
-                متن: {alert_data.get('alert_description', 'بدون متن')}
-                """
+            return _RSI_DETAILS_TEMPLATE.format(
+                pair=alert_data.get("pair", "N/A"),
+                alert_type=translate_alert_type(alert_type),
+                timeframe=alert_data.get("timeframe", "N/A"),
+                rsi_period=alert_data.get("rsi_period", "N/A"),
+                condition_text=condition_text,
+                threshold=alert_data.get("rsi_threshold"),
+                description=alert_data.get("alert_description", "بدون متن"),
             )
         else:  # Default to price alert format
-            return dedent(
-                f"""
-                جفت ارز: #{alert_data.get('pair', 'N/A')}
-                نوع: {translate_alert_type(alert_type)}
-                قیمت: {alert_data.get('price', 'N/A')}
-                متن: {alert_data.get('alert_description', 'بدون متن')}
-                """
+            return _PRICE_DETAILS_TEMPLATE.format(
+                pair=alert_data.get("pair", "N/A"),
+                alert_type=translate_alert_type(alert_type),
+                price=alert_data.get("price", "N/A"),
+                description=alert_data.get("alert_description", "بدون متن"),
             )
 
     @staticmethod
@@ -40,38 +89,20 @@ class AlertManager:
     ) -> str:
         alert_type = alert_data.get("alert_type")
         if alert_type == "alert_rsi":
-            pair = alert_data.get("pair")
-            timeframe = alert_data.get("timeframe")
-            description = alert_data.get("alert_description")
-            return dedent(
-                f"""
-                🔔 آلارم RSI فعال شد! 🔔
-
-                {trigger_reason}
-
-                جفت ارز: #{pair}
-                تایم فریم: {timeframe}
-                RSI فعلی: {current_value:.2f}
-                متن: {description}
-
-                🔄 تعداد تکرار: {trigger_count}
-                """
+            return _RSI_TRIGGER_TEMPLATE.format(
+                trigger_reason=trigger_reason,
+                pair=alert_data.get("pair"),
+                timeframe=alert_data.get("timeframe"),
+                current_value=current_value,
+                description=alert_data.get("alert_description"),
+                trigger_count=trigger_count,
             )
         else:  # Default to price alert format
-            pair = alert_data.get("pair")
-            target_price = alert_data.get("price")
-            description = alert_data.get("alert_description")
-            return dedent(
-                f"""
-                🔔 آلارم قیمت فعال شد! 🔔
-
-                {trigger_reason}
-
-                جفت ارز: #{pair}
-                قیمت هدف: {target_price}
-                قیمت فعلی: {current_value}
-                متن: {description}
-
-                🔄 تعداد تکرار: {trigger_count}
-                """
+            return _PRICE_TRIGGER_TEMPLATE.format(
+                trigger_reason=trigger_reason,
+                pair=alert_data.get("pair"),
+                target_price=alert_data.get("price"),
+                current_value=current_value,
+                description=alert_data.get("alert_description"),
+                trigger_count=trigger_count,
             )
@@ -1,30 +1,65 @@
+import asyncio
 import re
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import config
 from bot.decorators import retry_on_network_error
 from logging_config import api_logger
 
+# requests-style proxy mapping for the synchronous HTTP calls
+REQUESTS_PROXIES = (
+    {"http": config.PROXY_URL, "https": config.PROXY_URL} if config.PROXY_URL else None
+)
 
-def translate_alert_type(alert_type):
-    return {"alert_price": "قیمت", "alert_candle": "کندل", "alert_rsi": "RSI"}.get(
-        alert_type, "ناشناخته"
-    )
+# Shared session so the blocking fallback reuses its TCP/TLS connection
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=50))
+_session.trust_env = False
+if REQUESTS_PROXIES:
+    _session.proxies.update(REQUESTS_PROXIES)
+
+
+# Durations like '1h30m10s'; every unit is optional but they keep this order
+_DURATION_RE = re.compile(r"(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s)?")
+
+
+class _AlertTypeNames(dict):
+    """Alert type -> display name; unknown types fall back to a default."""
+
+    def __missing__(self, key):
+        return "ناشناخته"
+
+
+_ALERT_TYPE_NAMES = _AlertTypeNames(
+    {"alert_price": "قیمت", "alert_candle": "کندل", "alert_rsi": "RSI"}
+)
+
+translate_alert_type = _ALERT_TYPE_NAMES.__getitem__
+
+
+async def is_valid_pair(pair: str) -> bool:
+    """Checks a pair against the cached exchange symbols."""
+    if config.VALID_SYMBOLS:
+        return pair in config.VALID_SYMBOLS
+    # The symbol list couldn't be loaded yet, so ask the exchange directly
+    return bool(await asyncio.to_thread(_fetch_is_valid_pair, pair))
 
 
 @retry_on_network_error(max_retries=2, initial_delay=1)
-def is_valid_pair(pair: str) -> bool:
-    """Synchronous version of is_valid_pair for use in async handlers."""
+def _fetch_is_valid_pair(pair: str) -> bool:
+    """Validates a single pair with a blocking request to the tickers endpoint."""
     url = f"{config.BITUNIX_API_URL}/futures/market/tickers"
     params = {"symbols": pair}
-    api_logger.info(f"REQUEST -> is_valid_pair: URL={url}, Params={params}")
+    api_logger.info(f"REQUEST -> _fetch_is_valid_pair: URL={url}, Params={params}")
 
-    response = requests.get(url=url, params=params, timeout=5)
+    response = _session.get(url=url, params=params, timeout=5)
     api_logger.info(
-        f"RESPONSE -> is_valid_pair: Status={response.status_code}, Body={response.text}"
+        f"RESPONSE -> _fetch_is_valid_pair: Status={response.status_code}, Body={response.text}"
     )
     response.raise_for_status()  # Will trigger retry if status code is an error
 
-    if response.status_code == 200 and response.json().get("data"):
+    if response.status_code == 200 and orjson.loads(response.content).get("data"):
         return True
     return False
 
@@ -32,19 +67,10 @@ def is_valid_pair(pair: str) -> bool:
 def parse_duration(duration_str: str) -> int:
     """
     Parses a duration string like '1h30m10s' into total seconds.
-    Supports h, m, and s units. Returns 0 if the format is invalid.
+    Supports h, m, and s units, in that order. Returns 0 if the format is invalid.
     """
-    parts = re.findall(r"(\d+)([hms])", duration_str.lower())
-    if not parts:
+    match = _DURATION_RE.fullmatch(duration_str.strip().lower())
+    if not match:
         return 0
-
-    seconds = 0
-    for value, unit in parts:
-        value = int(value)
-        if unit == "h":
-            seconds += value * 3600
-        elif unit == "m":
-            seconds += value * 60
-        elif unit == "s":
-            seconds += value
-    return seconds
+    hours, minutes, seconds = (int(value or 0) for value in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
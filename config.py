@@ -10,6 +10,31 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 ADMIN_ID = 79795657  # Your Telegram User ID
 ALLOWED_USERS = [ADMIN_ID, 239339319]  # Start with admin, other users can be added
 
+# --- Proxy Settings ---
+# Outbound proxy passed explicitly to the Telegram, REST and WebSocket clients.
+# Set PROXY_URL to an empty string to connect directly.
+PROXY_URL = os.getenv("PROXY_URL", "http://127.0.0.1:10808") or None
+
+# --- Webhook Settings ---
+# When USE_WEBHOOK is set, Telegram pushes updates to WEBHOOK_URL instead of
+# the bot long-polling getUpdates. Polling stays the default for development.
+USE_WEBHOOK = os.getenv("USE_WEBHOOK", "").lower() in ("1", "true", "yes")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+# Secret path the webhook listens on; defaults to the bot token
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH") or TELEGRAM_BOT_TOKEN
+# Telegram echoes this in the X-Telegram-Bot-Api-Secret-Token header of every
+# update, so requests without it are rejected. Allowed characters: A-Z, a-z,
+# 0-9, _ and -, up to 256 of them.
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN") or None
+
+if USE_WEBHOOK:
+    # Fail at startup rather than letting PTB register a broken webhook
+    if not WEBHOOK_URL:
+        raise ValueError("USE_WEBHOOK is set but WEBHOOK_URL is empty.")
+    if not WEBHOOK_SECRET_TOKEN:
+        raise ValueError("USE_WEBHOOK is set but WEBHOOK_SECRET_TOKEN is empty.")
+
 # --- Database Configuration ---
 DB_FILE = "alerts.db"
 
@@ -21,10 +46,48 @@ BITUNIX_WS_URL = "wss://fapi.bitunix.com/public/"
 TIMEZONE = timezone(timedelta(hours=3, minutes=30))  # Asia/Tehran
 
 # --- Bot Settings ---
-# A dictionary to hold references to running alarm tasks
-# The key is the alert_id and the value is the asyncio.Task object
-ACTIVE_ALARM_TASKS = {}
+# Symbols shown by /summary; kept subscribed on the WebSocket feed
+SUMMARY_SYMBOLS = [
+    "BTCUSDT",
+    "ETHUSDT",
+    "XRPUSDT",
+    "BNBUSDT",
+    "SOLUSDT",
+    "DOGEUSDT",
+    "TRXUSDT",
+    "ADAUSDT",
+    "AVAXUSDT",
+    "BCHUSDT",
+    "LINKUSDT",
+    "USDCUSDT",
+]
+
+# Price alerts are grouped by pair so one task per pair evaluates every
+# alert on it whenever the WebSocket feed delivers a new price
+# The key is the pair and the value is a dict of alert_id -> PriceAlertSpec
+PRICE_ALERT_GROUPS = {}
+
+# A dictionary to hold references to the running per-pair price tasks
+# The key is the pair and the value is the asyncio.Task object
+PRICE_GROUP_TASKS = {}
+
+# RSI alerts are grouped by the kline stream they watch so each
+# (pair, timeframe) is fetched once per tick regardless of alert count
+# The key is (pair, timeframe) and the value is a dict of alert_id -> RsiAlertSpec
+RSI_ALERT_GROUPS = {}
 
 # A dictionary to hold the latest prices from the WebSocket stream
 # The key is the pair (e.g., 'BTCUSDT') and the value is the float price
 LATEST_PRICES = {}
+
+# Per-pair events fired by the WebSocket client whenever a new price arrives
+# The key is the pair and the value is an asyncio.Event
+PRICE_EVENTS = {}
+
+# Number of running price monitors per pair, used to drop unused subscriptions
+# The key is the pair and the value is the subscriber count
+PRICE_SUBSCRIBERS = {}
+
+# Every symbol listed on the exchange, refreshed periodically so pair input
+# can be validated without a request per message. Empty until first loaded.
+VALID_SYMBOLS = frozenset()
@@ -1,188 +1,308 @@
-import sqlite3
-from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
 from datetime import datetime
 
-# A list of columns that are safe to be queried directly.
-# I've added the new RSI fields to this whitelist.
-ALLOWED_QUERY_FIELDS = [
-    "id",
-    "user_id",
-    "alert_description",
-    "alert_type",
-    "pair",
-    "timeframe",
-    "price",
-    "created_at",
-    "is_active",
-    "candle_slope",
-    "trigger_count",
-    "last_message_id",
-    "rsi_period",
-    "rsi_condition",
-    "rsi_threshold",
-]
-
-# Whitelist of fields that users are allowed to update.
-# RSI alerts are not editable for now, so this list remains unchanged.
-UPDATABLE_ALERT_FIELDS = ["price", "alert_description"]
+import aiosqlite
+
+import config
+from logging_config import logger
+
+# Fields required to create an alert. Price is not required for RSI alerts.
+REQUIRED_ALERT_FIELDS = ["user_id", "alert_type", "pair"]
+
+INSERT_ALERT_QUERY = """
+    INSERT INTO alerts
+    (user_id, alert_description, alert_type, pair, timeframe, price, candle_slope, created_at,
+     rsi_period, rsi_condition, rsi_threshold)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Single inserts read the stored row back in the same statement (SQLite 3.35+)
+INSERT_ALERT_RETURNING_QUERY = INSERT_ALERT_QUERY + "RETURNING *"
+
+# REAL columns; RETURNING yields whole values as ints, unlike a SELECT
+REAL_ALERT_FIELDS = ("price", "rsi_threshold")
+
+
+class AlertSummary(NamedTuple):
+    """The columns shown for each alert in a user's alert list."""
+
+    id: int
+    pair: str
+    alert_type: str
+    price: Optional[float]
+    rsi_threshold: Optional[float]
+
+
+ALERT_SUMMARY_QUERY = f"""
+    SELECT {', '.join(AlertSummary._fields)} FROM alerts
+    WHERE user_id = ? AND is_active = 1 ORDER BY created_at DESC
+"""
+
+
+# Max number of alert rows / users kept in the read caches
+READ_CACHE_SIZE = 256
+
+
+class _LRUCache:
+    """A minimal least-recently-used mapping with a fixed capacity."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
 
 
 class DatabaseManager:
     def __init__(self, db_file: str):
         self.db_file = db_file
-        self.init_db()
-
-    def _get_connection(self):
-        """Creates and returns a new database connection."""
-        return sqlite3.connect(self.db_file)
-
-    def init_db(self):
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS alerts (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    alert_description TEXT,
-                    alert_type TEXT NOT NULL,
-                    pair TEXT NOT NULL,
-                    timeframe TEXT,
-                    price REAL,
-                    candle_slope TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_triggered TIMESTAMP,
-                    trigger_count INTEGER DEFAULT 0,
-                    last_message_id INTEGER,
-                    is_active BOOLEAN DEFAULT 1,
-                    rsi_period INTEGER,
-                    rsi_condition TEXT,
-                    rsi_threshold REAL
-                )
+        # Read-through caches for alert browsing. Alerts only change through
+        # this class, so every write path below invalidates what it touches.
+        self._alert_cache = _LRUCache(READ_CACHE_SIZE)  # alert_id -> row
+        self._user_alerts_cache = _LRUCache(
+            READ_CACHE_SIZE
+        )  # user_id -> [AlertSummary]
+        # A single long-lived connection; aiosqlite serializes access to it,
+        # which matches SQLite's single-writer model
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._conn_lock = asyncio.Lock()
+
+    async def _get_connection(self) -> aiosqlite.Connection:
+        """Returns the shared connection, opening it on first use."""
+        if self._conn is None:
+            async with self._conn_lock:
+                if self._conn is None:
+                    conn = await aiosqlite.connect(self.db_file)
+                    conn.row_factory = aiosqlite.Row
+                    # WAL makes a NORMAL sync level safe, skipping an fsync per commit
+                    await conn.execute("PRAGMA synchronous=NORMAL")
+                    await conn.execute("PRAGMA temp_store=MEMORY")
+                    # ~20 MB page cache so the hot alert pages stay in memory
+                    await conn.execute("PRAGMA cache_size=-20000")
+                    await self.init_db(conn)
+                    self._conn = conn
+        return self._conn
+
+    async def warmup(self):
+        """Opens the connection and creates the schema before the first update."""
+        await self._get_connection()
+
+    async def close(self):
+        """Closes the shared connection, if it was ever opened."""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _invalidate_alert(self, alert_id: int, user_id: Optional[int] = None):
+        """Drops cached data for an alert and its owner's alert lists."""
+        row = self._alert_cache.pop(alert_id)
+        if user_id is None and row is not None:
+            user_id = row["user_id"]
+        if user_id is not None:
+            self._user_alerts_cache.pop(user_id)
+        else:
+            self._user_alerts_cache.clear()
+
+    @staticmethod
+    def _returned_alert(row: aiosqlite.Row) -> Dict[str, Any]:
+        """Converts a RETURNING row to the dict a SELECT would have produced."""
+        alert = dict(row)
+        for field in REAL_ALERT_FIELDS:
+            if alert[field] is not None:
+                alert[field] = float(alert[field])
+        return alert
+
+    @staticmethod
+    def _alert_row(alert_data: Dict[str, Any], created_at: datetime) -> Tuple:
+        """Converts alert data into a parameter tuple for INSERT_ALERT_QUERY."""
+        return (
+            alert_data.get("user_id"),
+            alert_data.get("alert_description"),
+            alert_data.get("alert_type"),
+            alert_data.get("pair"),
+            alert_data.get("timeframe"),
+            alert_data.get("price"),
+            alert_data.get("candle_slope"),
+            created_at,
+            alert_data.get("rsi_period"),
+            alert_data.get("rsi_condition"),
+            alert_data.get("rsi_threshold"),
+        )
+
+    @staticmethod
+    async def init_db(conn: aiosqlite.Connection):
+        # Journal mode is persistent, so it only needs to be set once
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute(
             """
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                alert_description TEXT,
+                alert_type TEXT NOT NULL,
+                pair TEXT NOT NULL,
+                timeframe TEXT,
+                price REAL,
+                candle_slope TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_triggered TIMESTAMP,
+                trigger_count INTEGER DEFAULT 0,
+                last_message_id INTEGER,
+                is_active BOOLEAN DEFAULT 1,
+                rsi_period INTEGER,
+                rsi_condition TEXT,
+                rsi_threshold REAL
             )
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    first_name TEXT,
-                    is_allowed BOOLEAN DEFAULT 0,
-                    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
+        """
+        )
+        # Serves ALERT_SUMMARY_QUERY's filter and ordering without a table scan.
+        # Lookups by (user_id, id) already seek on the rowid primary key.
+        await conn.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_alerts_user_active
+            ON alerts (user_id, is_active, created_at)
+        """
+        )
+        await conn.execute(
             """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                first_name TEXT,
+                is_allowed BOOLEAN DEFAULT 0,
+                joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-            conn.commit()
-
-    def add_user(self, user_id: int, username: str, first_name: str, is_allowed: bool):
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT OR IGNORE INTO users (user_id, username, first_name, is_allowed, joined_at)
-                VALUES (?, ?, ?, ?, ?)
+        """
+        )
+        await conn.commit()
+
+    async def add_user(
+        self, user_id: int, username: str, first_name: str, is_allowed: bool
+    ):
+        conn = await self._get_connection()
+        await conn.execute(
+            """
+            INSERT OR IGNORE INTO users (user_id, username, first_name, is_allowed, joined_at)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (user_id, username, first_name, is_allowed, datetime.now()),
+        )
+        await conn.commit()
+
+    async def save_alert(self, alert_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Inserts an alert and returns the stored row, or None if data is missing."""
+        if not all(field in alert_data for field in REQUIRED_ALERT_FIELDS):
+            logger.error("Missing required fields in alert_data")
+            return None
+
+        conn = await self._get_connection()
+        async with conn.execute(
+            INSERT_ALERT_RETURNING_QUERY, self._alert_row(alert_data, datetime.now())
+        ) as cursor:
+            alert = self._returned_alert(await cursor.fetchone())
+        await conn.commit()
+        self._user_alerts_cache.pop(alert_data["user_id"])
+        return alert
+
+    async def update_alert_trigger_info(self, alert_id: int, message_id: int):
+        conn = await self._get_connection()
+        await conn.execute(
+            """
+            UPDATE alerts
+            SET trigger_count = trigger_count + 1,
+                last_message_id = ?,
+                last_triggered = ?
+            WHERE id = ?
             """,
-                (user_id, username, first_name, is_allowed, datetime.now()),
-            )
-            conn.commit()
+            (message_id, datetime.now(), alert_id),
+        )
+        await conn.commit()
+        self._invalidate_alert(alert_id)
+
+    async def get_user_alert_summaries(self, user_id: int) -> List[AlertSummary]:
+        """Returns a user's active alerts as AlertSummary rows, newest first."""
+        cached = self._user_alerts_cache.get(user_id)
+        if cached is not None:
+            return cached
 
-    def save_alert(self, alert_data: Dict[str, Any]) -> Optional[int]:
-        # Price is not required for RSI alerts, so we adjust the check
-        required_fields = ["user_id", "alert_type", "pair"]
-        if not all(field in alert_data for field in required_fields):
-            print("Error: Missing required fields in alert_data")
+        conn = await self._get_connection()
+        async with conn.execute(ALERT_SUMMARY_QUERY, (user_id,)) as cursor:
+            alerts = [AlertSummary._make(row) for row in await cursor.fetchall()]
+
+        self._user_alerts_cache.put(user_id, alerts)
+        return alerts
+
+    async def get_all_active_alerts(self) -> List[Dict]:
+        conn = await self._get_connection()
+        async with conn.execute("SELECT * FROM alerts WHERE is_active = 1") as cursor:
+            return [dict(row) for row in await cursor.fetchall()]
+
+    async def get_alert_by_id(
+        self, user_id: int, alert_id: int
+    ) -> Optional[Dict[str, Any]]:
+        cached = self._alert_cache.get(alert_id)
+        if cached is not None:
+            return cached if cached["user_id"] == user_id else None
+
+        conn = await self._get_connection()
+        async with conn.execute(
+            "SELECT * FROM alerts WHERE user_id = ? AND id = ?", (user_id, alert_id)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if not row:
             return None
+        alert = dict(row)
+        self._alert_cache.put(alert_id, alert)
+        return alert
 
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                INSERT INTO alerts
-                (user_id, alert_description, alert_type, pair, timeframe, price, candle_slope, created_at,
-                 rsi_period, rsi_condition, rsi_threshold)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    async def pop_user_alert(
+        self, user_id: int, alert_id: int
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Deactivates an alert in a single statement and returns the deactivated
+        row (or None if it doesn't exist or is already inactive) together with
+        a status message.
+        """
+        conn = await self._get_connection()
+        async with conn.execute(
+            """
+            UPDATE alerts SET is_active = 0
+            WHERE user_id = ? AND id = ? AND is_active = 1
+            RETURNING *
             """,
-                (
-                    alert_data.get("user_id"),
-                    alert_data.get("alert_description"),
-                    alert_data.get("alert_type"),
-                    alert_data.get("pair"),
-                    alert_data.get("timeframe"),
-                    alert_data.get("price"),
-                    alert_data.get("candle_slope"),
-                    datetime.now(),
-                    alert_data.get("rsi_period"),
-                    alert_data.get("rsi_condition"),
-                    alert_data.get("rsi_threshold"),
-                ),
-            )
-            conn.commit()
-            return cursor.lastrowid
-
-    def update_alert_trigger_info(self, alert_id: int, message_id: int):
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                UPDATE alerts
-                SET trigger_count = trigger_count + 1,
-                    last_message_id = ?,
-                    last_triggered = ?
-                WHERE id = ?
-                """,
-                (message_id, datetime.now(), alert_id),
+            (user_id, alert_id),
+        ) as cursor:
+            row = await cursor.fetchone()
+        await conn.commit()
+        self._invalidate_alert(alert_id, user_id)
+        if row is not None:
+            return (
+                self._returned_alert(row),
+                f"آلارم با شناسه {alert_id} با موفقیت حذف شد.",
             )
-            conn.commit()
-
-    def update_alert_field(self, alert_id: int, field: str, value: Any) -> bool:
-        """Safely updates a single field for a given alert."""
-        if field not in UPDATABLE_ALERT_FIELDS:
-            raise ValueError(f"Attempted to update a non-updatable field: {field}")
-
-        query = f"UPDATE alerts SET {field} = ? WHERE id = ?"
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, (value, alert_id))
-            conn.commit()
-            return cursor.rowcount > 0
-
-    def get_user_alerts(self, user_id: int, fields: List[str]) -> List[Dict]:
-        for field in fields:
-            if field not in ALLOWED_QUERY_FIELDS:
-                raise ValueError(f"Disallowed field in query: {field}")
-
-        query = f"SELECT {', '.join(fields)} FROM alerts WHERE user_id = ? AND is_active = 1 ORDER BY created_at DESC"
-        with self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute(query, (user_id,))
-            return [dict(row) for row in cursor.fetchall()]
-
-    def get_all_active_alerts(self) -> List[Dict]:
-        with self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM alerts WHERE is_active = 1")
-            return [dict(row) for row in cursor.fetchall()]
-
-    def get_alert_by_id(self, user_id: int, alert_id: int) -> Optional[Dict[str, Any]]:
-        with self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM alerts WHERE user_id = ? AND id = ?", (user_id, alert_id)
-            )
-            row = cursor.fetchone()
-            return dict(row) if row else None
-
-    def delete_user_alert(self, user_id: int, alert_id: int) -> Tuple[bool, str]:
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE alerts SET is_active = 0 WHERE user_id = ? AND id = ?",
-                (user_id, alert_id),
-            )
-            conn.commit()
-            if cursor.rowcount > 0:
-                return True, f"آلارم با شناسه {alert_id} با موفقیت حذف شد."
-            return False, "آلارم یافت نشد یا قبلاً حذف شده است."
+        return None, "آلارم یافت نشد یا قبلاً حذف شده است."
+
+    async def delete_user_alert(self, user_id: int, alert_id: int) -> Tuple[bool, str]:
+        alert, message = await self.pop_user_alert(user_id, alert_id)
+        return alert is not None, message
+
+
+db = DatabaseManager(config.DB_FILE)
@@ -1,7 +1,8 @@
-import os
 import asyncio
+import re
 from telegram import Update
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     ApplicationBuilder,
     CommandHandler,
@@ -10,9 +11,10 @@ from telegram.ext import (
     ConversationHandler,
     CallbackQueryHandler,
 )
+from telegram.request import HTTPXRequest
 
 import config
-from api_manager import ws_client
+from api_manager import ws_client, close_http_client
 from bot.handlers import (
     start,
     new_alarm_command,
@@ -33,54 +35,101 @@ from bot.handlers import (
     rsi_condition_handler,
     rsi_threshold_input_handler,
 )
-from bot.monitors import start_alarm_task
-from bot.constants import *
-from database_manager import DatabaseManager
+from bot.monitors import rehydrate_alarms, pin_summary_prices, start_symbol_refresh
+from bot.constants import (
+    MAIN_MENU,
+    VIEW_ALERT,
+    VIEW_ALERT_DETAILS,
+    ALERT_TYPE,
+    PAIR_INPUT,
+    PRICE_INPUT,
+    DESCRIPTION_INPUT,
+    TIMEFRAME_INPUT,
+    RSI_PERIOD_INPUT,
+    RSI_CONDITION_INPUT,
+    RSI_THRESHOLD_INPUT,
+)
+from database_manager import db
 from logging_config import logger
 
-# --- Proxy Settings ---
-os.environ["http_proxy"] = "http://127.0.0.1:10808"
-os.environ["https_proxy"] = "http://127.0.0.1:10808"
 
-# --- Database Initialization ---
-db = DatabaseManager(config.DB_FILE)
+# The only update types the handlers react to; Telegram skips sending the rest
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+UPDATE_QUEUE_SIZE = 1024
+
+# Callback data patterns, compiled once at import
+MAIN_MENU_PATTERN = re.compile(r"^new_alert$|^view_alerts$")
+ALERT_PATTERN = re.compile(r"^alert_")
+DELETE_PATTERN = re.compile(r"^delete_")
+ALERT_TYPE_PATTERN = re.compile(r"^alert_(price|rsi)$")
+RSI_CONDITION_PATTERN = re.compile(r"^rsi_(above|below)$")
+BACK_TO_DETAILS_PATTERN = re.compile(r"^back_to_details_")
+BACK_TO_MAIN_PATTERN = re.compile(r"^back_to_main$")
 
 
 async def post_init(application: Application):
     logger.info("--- Bot initialization complete ---")
-    logger.info("--- Reloading active alerts from database ---")
-
-    active_alerts = db.get_all_active_alerts()
-    # Subscribe to all unique pairs from active price alerts
-    price_alert_pairs = {
-        alert["pair"] for alert in active_alerts if alert["alert_type"] == "alert_price"
-    }
-    for pair in price_alert_pairs:
-        ws_client.add_subscription(pair)
+    await db.warmup()
+    pin_summary_prices()
+    # Start the WebSocket client on PTB's event loop
+    ws_client.start()
+    logger.info("BACKGROUND: Bitunix WebSocket client started.")
+    start_symbol_refresh(application)
+    await rehydrate_alarms(application)
+
+
+async def post_shutdown(application: Application):
+    await ws_client.stop()
+    await close_http_client()
+    await db.close()
     logger.info(
-        f"--- Queued WS subscriptions for {len(price_alert_pairs)} unique pairs ---"
+        "--- Stopped WebSocket client, closed HTTP client and database connection ---"
     )
 
-    count = 0
-    for alert in active_alerts:
-        await start_alarm_task(application, alert)
-        count += 1
-    logger.info(f"--- Successfully reloaded {count} active alerts ---")
-
 
 def main():
     if not config.TELEGRAM_BOT_TOKEN:
         logger.critical("FATAL: TELEGRAM_BOT_TOKEN not found!")
         return
 
-    # Configure timeouts for the bot's HTTP requests to make it more resilient
+    # Configure timeouts for the bot's HTTP requests to make it more resilient.
+    # Outbound API calls and getUpdates use separate connection pools so the
+    # long-held polling connection never starves alarm messages.
     application = (
         ApplicationBuilder()
         .token(config.TELEGRAM_BOT_TOKEN)
         .post_init(post_init)
-        .connect_timeout(30)
-        .read_timeout(30)
-        .write_timeout(30)
+        .post_shutdown(post_shutdown)
+        # Queues every Bot API call under Telegram's flood limits (30 msg/s
+        # overall, 20 msg/min per group) and retries RetryAfter replies, so a
+        # burst of triggered alerts doesn't turn into a 429 storm
+        .rate_limiter(AIORateLimiter(max_retries=3))
+        .request(
+            HTTPXRequest(
+                connection_pool_size=32,
+                # Alarm fan-out is multiplexed over one TLS connection
+                http_version="2",
+                pool_timeout=10,
+                proxy=config.PROXY_URL,
+                connect_timeout=30,
+                read_timeout=30,
+                write_timeout=30,
+            )
+        )
+        .get_updates_request(
+            HTTPXRequest(
+                connection_pool_size=1,
+                pool_timeout=5,
+                proxy=config.PROXY_URL,
+                connect_timeout=30,
+                # PTB adds the 20s long-poll timeout below on top of this
+                read_timeout=30,
+                write_timeout=30,
+            )
+        )
+        # Bounded so a burst of updates applies backpressure instead of
+        # growing memory without limit
+        .update_queue(asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE))
         .build()
     )
 
@@ -92,18 +141,18 @@ def main():
         ],
         states={
             MAIN_MENU: [
-                CallbackQueryHandler(
-                    main_menu_handler, pattern="^new_alert$|^view_alerts$"
-                )
+                CallbackQueryHandler(main_menu_handler, pattern=MAIN_MENU_PATTERN)
             ],
             VIEW_ALERT: [
-                CallbackQueryHandler(view_alert_details_handler, pattern="^alert_")
+                CallbackQueryHandler(view_alert_details_handler, pattern=ALERT_PATTERN)
             ],
             VIEW_ALERT_DETAILS: [
-                CallbackQueryHandler(delete_confirmation_handler, pattern="^delete_")
+                CallbackQueryHandler(
+                    delete_confirmation_handler, pattern=DELETE_PATTERN
+                )
             ],
             ALERT_TYPE: [
-                CallbackQueryHandler(alert_type_handler, pattern="^alert_(price|rsi)$")
+                CallbackQueryHandler(alert_type_handler, pattern=ALERT_TYPE_PATTERN)
             ],
             PAIR_INPUT: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, pair_input_handler)
@@ -126,7 +175,7 @@ def main():
             ],
             RSI_CONDITION_INPUT: [
                 CallbackQueryHandler(
-                    rsi_condition_handler, pattern="^rsi_(above|below)$"
+                    rsi_condition_handler, pattern=RSI_CONDITION_PATTERN
                 )
             ],
             RSI_THRESHOLD_INPUT: [
@@ -137,9 +186,9 @@ def main():
         },
         fallbacks=[
             CallbackQueryHandler(
-                view_alert_details_handler, pattern="^back_to_details_"
+                view_alert_details_handler, pattern=BACK_TO_DETAILS_PATTERN
             ),
-            CallbackQueryHandler(start, pattern="^back_to_main$"),
+            CallbackQueryHandler(start, pattern=BACK_TO_MAIN_PATTERN),
             CommandHandler("cancel", cancel),
         ],
         allow_reentry=True,
@@ -150,14 +199,33 @@ def main():
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("remind", remind_command))
 
-    loop = asyncio.get_event_loop()
-    # Start the WebSocket client in the background
-    loop.create_task(ws_client.run())
-    logger.info("BACKGROUND: Bitunix WebSocket client started.")
+    if config.USE_WEBHOOK:
+        # Telegram pushes updates to us; PTB registers the webhook itself
+        logger.info("🟡 CryptoAlertBot started successfully! Starting webhook...")
+        application.run_webhook(
+            listen="0.0.0.0",
+            port=config.WEBHOOK_PORT,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=f"{config.WEBHOOK_URL}/{config.WEBHOOK_PATH}",
+            secret_token=config.WEBHOOK_SECRET_TOKEN,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+        return
 
     logger.info("🟡 CryptoAlertBot started successfully! Starting polling...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    # Long-poll: Telegram holds each getUpdates open for up to 20s and answers
+    # as soon as an update arrives, so an idle bot makes few requests
+    application.run_polling(
+        timeout=20, poll_interval=0.0, allowed_updates=ALLOWED_UPDATES
+    )
 
 
 if __name__ == "__main__":
+    # uvloop is optional: a faster libuv-based event loop where available
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     main()
@@ -14,7 +14,8 @@ MIGRATIONS_DIR="migrations"
 # 1. Delete the database file
 echo "Attempting to delete database file..."
 if [ -f "$DB_FILE" ]; then
-    rm -f "$DB_FILE"
+    # Also remove the WAL sidecar files left by journal_mode=WAL
+    rm -f "$DB_FILE" "$DB_FILE-wal" "$DB_FILE-shm"
     echo "✅ Database file '$DB_FILE' deleted."
 else
     echo "ℹ️ Database file '$DB_FILE' not found, skipping."